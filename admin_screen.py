@@ -1,16 +1,111 @@
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QCheckBox,
                              QLabel, QPushButton, QGroupBox, QSpinBox,
-                             QGridLayout, QSizePolicy)
+                             QGridLayout, QSizePolicy, QComboBox)
 from PyQt6.QtCore import QTimer
 from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
 import matplotlib.pyplot as plt
 
 from ml_models import MLModels
+from clustering_engines import AUTO, ENGINES
+from jobs import Job
+from parallel_sweep import default_workers
+from instrumentation import tracer, format_span
+from cache_manager import cache_manager, REGIONS, format_bytes
+from lod_plot import LodScatter
+
+
+def elbow_job(job, langs_continuous, langs_categorical, k_range, n_jobs=1, metrics=False, engine=AUTO):
+    """Фоновая задача: масштабирование и метод локтя (по одной точке на k)"""
+    job.set_message("⏳ Масштабирование признаков...")
+    a = MLModels(engine=engine)
+    if not a.scaler_data(langs_continuous, langs_categorical):
+        return None
+    job.check_cancelled()
+    return a.for_plot_elbow(k_range, progress=lambda k, inertia, m: job.report((k, inertia, m)),
+                            should_stop=job.is_cancelled, n_jobs=n_jobs, metrics=metrics)
+
+
+def retrain_job(job):
+    """Фоновая задача: дообучение последней модели на новых строках"""
+    stages = {'fit': "⏳ Дообучение модели на новых строках...",
+              'assign': "⏳ Пересчет номеров кластеров..."}
+
+    def progress(stage):
+        job.check_cancelled()
+        job.set_message(stages[stage])
+
+    return MLModels().retrain(progress=progress)
+
+
+def disk_usage_job(job):
+    """Фоновая задача: объем кэшей на диске (обход каталогов не в GUI-потоке)"""
+    return cache_manager.disk.usage()
+
+
+def clear_cache_job(job, memory, disk):
+    """Фоновая задача: очистка выбранных уровней кэша"""
+    job.set_message("🗑️ Очистка кэша...")
+    cache_manager.clear(memory=memory, disk=disk)
+    return memory, disk
+
+
+def segmentation_job(job, langs_continuous, langs_categorical, num_clusters, engine=AUTO):
+    """Фоновая задача: масштабирование, обучение модели кластеризации и PCA"""
+    job.set_message("⏳ Масштабирование признаков...")
+    a = MLModels(engine=engine)
+    if not a.scaler_data(langs_continuous, langs_categorical):
+        return None
+    stages = {'fit': f"⏳ Обучение {ENGINES[a.resolve_engine(num_clusters)].title}...",
+              'pca': "⏳ Расчет PCA..."}
+
+    def progress(stage):
+        job.check_cancelled()
+        job.set_message(stages[stage])
+
+    return a.for_plot_cluster_graph(num_clusters, progress=progress)
+
+
+def streaming_segmentation_job(job, langs_continuous, langs_categorical, num_clusters):
+    """Фоновая задача: потоковая кластеризация MiniBatchKMeans по порциям файла"""
+    features = ([key for key, value in langs_continuous.items() if value == 1] +
+                [key for key, value in langs_categorical.items() if value == 1])
+    if not features:
+        return None
+    job.set_message("⏳ Потоковая кластеризация MiniBatchKMeans...")
+    return MLModels().stream_segmentation(features, num_clusters)
+
+
+# Алгоритмы кластеризации для выбора в интерфейсе: название -> имя в реестре
+ENGINE_CHOICES = {'Авто (по размеру данных)': AUTO,
+                  **{engine.title: name for name, engine in ENGINES.items()}}
+
+
+# Как часто пересчитывается объем кэшей на диске, мс
+DISK_USAGE_INTERVAL = 15000
+
+
+# Уровни кэша для очистки: (память, диск)
+CACHE_TIERS = {
+    'Память': (True, False),
+    'Диск': (False, True),
+    'Память и диск': (True, True),
+}
+
 
 class AdminScreen(QWidget):
     def __init__(self):
         super().__init__()
+        self.current_job = None
+        self.disk_usage_job = None
+        self.disk_usage = {}
+        self.elbow_k = []
+        self.elbow_inertia = []
+        self.elbow_total = 0
+        self.elbow_metrics = {}
+        self.quality_metrics = False
+        self.scatter_lod = None
+        self.scatter_coords = None
         self.init_ui()
         self.langs_continuous = {'age':0, 'experience':0,
                                 'income':0, 'family':0, 'mortgage':0}
@@ -20,6 +115,9 @@ class AdminScreen(QWidget):
         self.min_num_clusters = 2
         self.max_num_clusters = 11
         self.num_clusters = 5
+        self.n_jobs = 1
+        self.engine = AUTO
+        self.streaming_mode = False
         self.error_style = """
             color: #FF9800; 
             font-weight: bold; 
@@ -148,6 +246,13 @@ class AdminScreen(QWidget):
         cluster_spin_1.valueChanged.connect(self.max_value_changed)
         control_layout.addWidget(cluster_spin_1, 4, 3)
 
+        """ Выбор алгоритма кластеризации """
+        engine_combo = QComboBox()
+        engine_combo.addItems(list(ENGINE_CHOICES))
+        engine_combo.setToolTip("Алгоритм кластеризации для метода локтя и сегментации")
+        engine_combo.currentTextChanged.connect(self.engine_changed)
+        control_layout.addWidget(engine_combo, 4, 4)
+
         """ Кнопка для начала метода локтя """
         elbow_btn = QPushButton("📐 Построить elbow график")
         elbow_btn.setStyleSheet("""
@@ -166,6 +271,26 @@ class AdminScreen(QWidget):
         elbow_btn.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Fixed)
         elbow_btn.clicked.connect(self.plot_elbow)
         control_layout.addWidget(elbow_btn, 5, 0, 1, 2)
+
+        """ Выбор числа процессов для метода локтя """
+        control_layout.addWidget(QLabel("Процессов:"), 5, 2)
+        jobs_spin = QSpinBox()
+        jobs_spin.setRange(1, default_workers())
+        jobs_spin.setValue(1)
+        jobs_spin.valueChanged.connect(self.jobs_value_changed)
+        control_layout.addWidget(jobs_spin, 5, 3)
+
+        """ Метрики качества кластеризации на графике локтя """
+        metrics_checkbox = QCheckBox()
+        metrics_checkbox.stateChanged.connect(self.metrics_checked)
+        metrics_checkbox.setText("Метрики качества")
+        control_layout.addWidget(metrics_checkbox, 5, 4)
+
+        """ Потоковый режим сегментации для больших данных """
+        streaming_checkbox = QCheckBox()
+        streaming_checkbox.stateChanged.connect(self.streaming_checked)
+        streaming_checkbox.setText("Потоковый режим")
+        control_layout.addWidget(streaming_checkbox, 6, 4)
         
         """ Выбор конечного числа кластеров """
         control_layout.addWidget(QLabel("Кол-во кластеров:"), 6, 0)
@@ -231,7 +356,11 @@ class AdminScreen(QWidget):
         actions_layout.setSpacing(10)  # Расстояние между кнопками
         actions_layout.setContentsMargins(15, 20, 15, 15)  # Отступы внутри группы
 
-        """ Кнопка для очистки кэша """
+        """ Выбор уровней кэша и кнопка для его очистки """
+        self.cache_tier_combo = QComboBox()
+        self.cache_tier_combo.addItems(list(CACHE_TIERS))
+        actions_layout.addWidget(self.cache_tier_combo)
+
         clear_cache_btn = QPushButton("🗑️ Очистить кэш")
         clear_cache_btn.setStyleSheet("""
             QPushButton {
@@ -250,6 +379,66 @@ class AdminScreen(QWidget):
         clear_cache_btn.clicked.connect(self.clear_cache)
 
         actions_layout.addWidget(clear_cache_btn)
+
+        """ Кнопка для дообучения модели на новых данных """
+        retrain_btn = QPushButton("🎯 Переобучить модель")
+        retrain_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #4acd32; 
+                color: white; 
+                border: none; 
+                padding: 4px; 
+                border-radius: 2px;
+                min-width: 90px;
+            }
+            QPushButton:hover {
+                background-color: #2fdb24;
+            }
+        """)
+        retrain_btn.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Fixed)
+        retrain_btn.clicked.connect(self.retrain_model)
+
+        actions_layout.addWidget(retrain_btn)
+
+        """ Кнопка для отмены текущего расчета """
+        cancel_btn = QPushButton("⛔ Отменить расчет")
+        cancel_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #f44336; 
+                color: white; 
+                border: none; 
+                padding: 4px; 
+                border-radius: 2px;
+                min-width: 90px;
+            }
+            QPushButton:hover {
+                background-color: #D32F2F;
+            }
+        """)
+        cancel_btn.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Fixed)
+        cancel_btn.clicked.connect(self.cancel_job)
+
+        actions_layout.addWidget(cancel_btn)
+
+        """ Кнопка для выгрузки трассировки """
+        trace_btn = QPushButton("💾 Экспорт трассировки")
+        trace_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #4acd32; 
+                color: white; 
+                border: none; 
+                padding: 4px; 
+                border-radius: 2px;
+                min-width: 90px;
+            }
+            QPushButton:hover {
+                background-color: #2fdb24;
+            }
+        """)
+        trace_btn.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Fixed)
+        trace_btn.clicked.connect(self.export_trace)
+
+        actions_layout.addWidget(trace_btn)
         actions_layout.addStretch()  # Добавляем растягивающееся пространство справа
 
         layout.addWidget(actions_group)
@@ -286,6 +475,27 @@ class AdminScreen(QWidget):
 
         status_layout.addWidget(self.status_label)
 
+        # Последние замеры времени горячих участков
+        self.timings_label = QLabel("Замеров пока нет")
+        self.timings_label.setStyleSheet("font-family: monospace; color: #666; padding: 4px;")
+        self.timings_label.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        status_layout.addWidget(self.timings_label)
+
+        # Статистика кэша по областям
+        self.cache_label = QLabel("Кэш пуст")
+        self.cache_label.setStyleSheet("font-family: monospace; color: #666; padding: 4px;")
+        self.cache_label.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        status_layout.addWidget(self.cache_label)
+
+        self.timings_timer = QTimer(self)
+        self.timings_timer.timeout.connect(self.refresh_timings)
+        self.timings_timer.timeout.connect(self.refresh_cache_stats)
+        self.timings_timer.start(1000)
+        # статистика памяти дешевая (раз в секунду), обход диска — реже и в фоне
+        self.disk_usage_timer = QTimer(self)
+        self.disk_usage_timer.timeout.connect(self.refresh_disk_usage)
+        self.disk_usage_timer.start(DISK_USAGE_INTERVAL)
+
         layout.addWidget(status_group)
 
         layout.addStretch()
@@ -357,87 +567,272 @@ class AdminScreen(QWidget):
         
     def value_segments(self, i):
         self.num_clusters = i
+
+    def jobs_value_changed(self, i):
+        self.n_jobs = i
+
+    def engine_changed(self, title):
+        self.engine = ENGINE_CHOICES[title]
+
+    def streaming_checked(self, checked):
+        self.streaming_mode = bool(checked)
+
+    def metrics_checked(self, checked):
+        self.quality_metrics = bool(checked)
     
     def plot_elbow(self):
         if self.min_num_clusters >= self.max_num_clusters:
             self.plot_elbow_def()
         else:
             k_range = range(self.min_num_clusters, self.max_num_clusters)
-            a = MLModels()
-            clust_status = a.scaler_data(self.langs_continuous, self.langs_categorical)
-            
-            if clust_status:
-                inertia = a.for_plot_elbow(k_range)
-        
-                # clearing old figure
-                self.figure.clear()
-                # create an axis
-                ax = self.figure.add_subplot(111)
-                # plot data
-                ax.plot(k_range, inertia, 'bo-')
-                ax.set_xlabel('Number of clusters')
-                ax.set_ylabel('Inertia')
-                ax.set_title('Elbow Method')
-                # refresh canvas
-                self.canvas.draw()
-                self.on_plot_elbow()
-            else:
-                self.no_variables_clustering()
+            if self.run_job(elbow_job, dict(self.langs_continuous), dict(self.langs_categorical),
+                            k_range, self.n_jobs, self.quality_metrics, self.engine,
+                            on_result=self.on_elbow_result,
+                            on_progress=self.on_elbow_progress):
+                self.elbow_k = []
+                self.elbow_inertia = []
+                self.elbow_metrics = {}
+                self.elbow_total = len(k_range)
+
+    def on_elbow_progress(self, point):
+        """Дорисовывает график локтя по мере расчета очередного k"""
+        k, inertia, metrics = point
+        self.elbow_k.append(k)
+        self.elbow_inertia.append(inertia)
+        if metrics is not None:
+            self.elbow_metrics[k] = metrics
+        self.status_label.setText(f"⏳ Метод локтя: k={k} ({len(self.elbow_k)}/{self.elbow_total})")
+        self.status_label.setStyleSheet(self.error_style)
+        self.draw_elbow()
+
+    def on_elbow_result(self, inertia):
+        if inertia is None:
+            self.no_variables_clustering()
+        else:
+            self.draw_elbow()
+            self.on_plot_elbow()
+
+    def draw_elbow(self):
+        # clearing old figure
+        self.figure.clear()
+        # create an axis
+        ax = self.figure.add_subplot(111)
+        # plot data
+        # при параллельном расчете точки приходят не по порядку k
+        points = sorted(zip(self.elbow_k, self.elbow_inertia))
+        ax.plot([k for k, _ in points], [inertia for _, inertia in points], 'bo-')
+        ax.set_xlabel('Number of clusters')
+        ax.set_ylabel('Inertia')
+        ax.set_title('Elbow Method')
+        if self.elbow_metrics:
+            self.draw_quality_metrics(ax)
+        # refresh canvas
+        with tracer.span('canvas.draw'):
+            self.canvas.draw()
             
+    def draw_quality_metrics(self, ax):
+        """Силуэт и Davies–Bouldin — на правой оси, Calinski–Harabasz — на отдельной"""
+        ks = sorted(self.elbow_metrics)
+        score_ax = ax.twinx()
+        score_ax.plot(ks, [self.elbow_metrics[k]['silhouette'] for k in ks], 'g^--', label='Silhouette')
+        score_ax.plot(ks, [self.elbow_metrics[k]['davies_bouldin'] for k in ks], 'rs--', label='Davies–Bouldin')
+        score_ax.set_ylabel('Silhouette / Davies–Bouldin')
+        ch_ax = ax.twinx()
+        ch_ax.spines['right'].set_position(('axes', 1.12))
+        ch_ax.plot(ks, [self.elbow_metrics[k]['calinski_harabasz'] for k in ks], 'md--', label='Calinski–Harabasz')
+        ch_ax.set_ylabel('Calinski–Harabasz')
+        lines = ax.get_lines() + score_ax.get_lines() + ch_ax.get_lines()
+        lines[0].set_label('Inertia')
+        ax.legend(lines, [line.get_label() for line in lines], fontsize='small')
+        # место справа под вторую ось (позиция общая для всех осей-близнецов)
+        pos = ax.get_position()
+        ax.set_position([pos.x0, pos.y0, pos.width * 0.82, pos.height])
+
     def plot_cluster_graph(self):
-        a = MLModels()
-        clust_status = a.scaler_data(self.langs_continuous, self.langs_categorical)
-        
-        if clust_status:
-            pca_features, df = a.for_plot_cluster_graph(self.num_clusters)
-            # clearing old figure
-            self.figure.clear()
-            # create an axis
-            ax = self.figure.add_subplot(111)
-            # plot data
-            scatter = ax.scatter(pca_features[:, 0], pca_features[:, 1],
-                            c=df['cluster_KMeans'], cmap='viridis', alpha=0.6)
-            ax.set_xlabel('PCA Component 1')
-            ax.set_ylabel('PCA Component 2')
-            ax.set_title('Кластеризация клиентов (KMeans)')
-
-            # refresh canvas
-            self.canvas.draw()
-            self.on_plot_elbow()
-            self.on_plot_elbow()
+        if self.streaming_mode:
+            self.run_job(streaming_segmentation_job, dict(self.langs_continuous),
+                         dict(self.langs_categorical), self.num_clusters,
+                         on_result=self.on_streaming_result)
         else:
+            self.run_job(segmentation_job, dict(self.langs_continuous), dict(self.langs_categorical),
+                         self.num_clusters, self.engine, on_result=self.on_cluster_graph_result)
+
+    def on_streaming_result(self, result):
+        """В потоковом режиме вместо PCA показываются размеры кластеров"""
+        if result is None:
             self.no_variables_clustering()
-    
-    def retrain_model(self):
-        """Запускает переобучение модели"""
-        print("🎯 Запуск переобучения модели...")
-        self.status_label.setText("🔄 Модель переобучается...")
-        self.status_label.setStyleSheet(self.error_style)
+            return
+        _, sizes = result
+        self.figure.clear()
+        ax = self.figure.add_subplot(111)
+        ax.bar(range(len(sizes)), sizes, color='skyblue', edgecolor='black')
+        ax.set_xlabel('Кластер')
+        ax.set_ylabel('Клиентов')
+        ax.set_title('Кластеризация клиентов (MiniBatchKMeans)')
+        with tracer.span('canvas.draw'):
+            self.canvas.draw()
+        self.on_plot_elbow()
 
-        # Имитация задержки переобучения
-        QTimer.singleShot(2000, self.on_retrain_complete)
+    def on_cluster_graph_result(self, result):
+        if result is None:
+            self.no_variables_clustering()
+            return
+        pca_features, df = result
+        labels = df['cluster_KMeans'].to_numpy()
+        if (self.scatter_lod is not None and self.scatter_lod.ax in self.figure.axes
+                and self.scatter_coords is pca_features):
+            # та же проекция (из кэша), изменились только кластеры: перекрашиваем
+            self.scatter_lod.set_labels(labels)
+            with tracer.span('canvas.draw'):
+                self.canvas.draw()
+            self.status_label.setText(f"✅ График перекрашен ({self.scatter_lod.description()}). "
+                                      "Все системы работают нормально")
+            self.status_label.setStyleSheet(self.green_style)
+            return
+        # clearing old figure
+        self.figure.clear()
+        # create an axis
+        ax = self.figure.add_subplot(111)
+        # plot data
+        # для больших данных рисуется выборка по кластерам (см. lod_plot)
+        self.scatter_lod = LodScatter(ax, pca_features[:, 0], pca_features[:, 1], labels=labels)
+        self.scatter_coords = pca_features
+        ax.set_xlabel('PCA Component 1')
+        ax.set_ylabel('PCA Component 2')
+        ax.set_title('Кластеризация клиентов (KMeans)')
 
-    def on_retrain_complete(self):
-        """Вызывается после завершения переобучения"""
-        print("✅ Модель успешно переобучена!")
-        self.status_label.setText("✅ Модель актуальна, все системы работают нормально")
+        # refresh canvas
+        with tracer.span('canvas.draw'):
+            self.canvas.draw()
+        self.status_label.setText(f"✅ График построен ({self.scatter_lod.description()}). "
+                                  "Все системы работают нормально")
         self.status_label.setStyleSheet(self.green_style)
 
-    def clear_cache(self):
-        """Очищает кэш системы"""
-        print("🗑️ Очистка кэша...")
-        self.status_label.setText("🗑️ Очистка кэша...")
+    def run_job(self, fn, *args, on_result, on_progress=None):
+        """Запускает расчет в фоне; одновременно выполняется не более одного"""
+        if self.current_job is not None:
+            self.status_label.setText("❗ Дождитесь завершения текущего расчета или отмените его")
+            self.status_label.setStyleSheet(self.error_style)
+            return False
+        job = Job(fn, *args)
+        job.signals.message.connect(self.on_job_message)
+        job.signals.result.connect(on_result)
+        if on_progress is not None:
+            job.signals.progress.connect(on_progress)
+        job.signals.error.connect(self.on_job_error)
+        job.signals.cancelled.connect(self.on_job_cancelled)
+        job.signals.finished.connect(self.on_job_finished)
+        self.current_job = job
+        job.start()
+        return True
+
+    def cancel_job(self):
+        """Отменяет текущий расчет"""
+        if self.current_job is not None:
+            self.current_job.cancel()
+            self.status_label.setText("⏳ Отмена расчета...")
+            self.status_label.setStyleSheet(self.error_style)
+
+    def on_job_message(self, text):
+        self.status_label.setText(text)
         self.status_label.setStyleSheet(self.error_style)
 
-        # Имитация задержки очистки
-        QTimer.singleShot(1000, self.on_cache_cleared)
+    def on_job_error(self, text):
+        print(f'Ошибка расчета: {text}')
+        self.status_label.setText(f"❗ Ошибка расчета: {text}")
+        self.status_label.setStyleSheet(self.error_style)
+
+    def on_job_cancelled(self):
+        print('Расчет отменен')
+        self.status_label.setText("⛔ Расчет отменен")
+        self.status_label.setStyleSheet(self.error_style)
 
-    def on_cache_cleared(self):
+    def on_job_finished(self):
+        self.current_job = None
+    
+    def retrain_model(self):
+        """Запускает дообучение модели на новых строках данных"""
+        self.run_job(retrain_job, on_result=self.on_retrain_complete)
+
+    def on_retrain_complete(self, summary):
+        """Вызывается после завершения дообучения"""
+        if summary['new_rows'] == 0:
+            self.status_label.setText("✅ Новых данных нет, модель актуальна")
+        else:
+            self.status_label.setText(f"✅ Модель дообучена: новых строк {summary['new_rows']}, "
+                                      f"обучающая выборка {summary['sample_rows']}, "
+                                      f"запуск {summary['run_id']}")
+        self.status_label.setStyleSheet(self.green_style)
+
+    def clear_cache(self):
+        """Очищает выбранные уровни кэша системы"""
+        memory, disk = CACHE_TIERS[self.cache_tier_combo.currentText()]
+        self.run_job(clear_cache_job, memory, disk, on_result=self.on_cache_cleared)
+
+    def on_cache_cleared(self, tiers):
         """Вызывается после очистки кэша"""
-        print("✅ Кэш успешно очищен!")
+        self.refresh_cache_stats()
+        self.refresh_disk_usage()
         self.status_label.setText("✅ Кэш очищен, все системы работают нормально")
         self.status_label.setStyleSheet(self.green_style)
+
+    def refresh_disk_usage(self):
+        """Запускает подсчет объема кэшей на диске, если панель видна и подсчет не идет"""
+        if self.disk_usage_job is not None or not self.isVisible():
+            return
+        self.disk_usage_job = Job(disk_usage_job)
+        self.disk_usage_job.signals.result.connect(self.on_disk_usage)
+        self.disk_usage_job.signals.finished.connect(self.on_disk_usage_finished)
+        self.disk_usage_job.start()
+
+    def on_disk_usage(self, usage):
+        self.disk_usage = usage
+        self.refresh_cache_stats()
+
+    def on_disk_usage_finished(self):
+        self.disk_usage_job = None
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh_disk_usage()
+
+    def refresh_cache_stats(self):
+        """Обновляет панель со статистикой кэша (объем на диске — из последнего подсчета)"""
+        if not self.isVisible():
+            return
+        stats = cache_manager.memory.stats()
+        for region, (entries, nbytes) in self.disk_usage.items():
+            stats[region]['disk_entries'] = entries
+            stats[region]['disk_bytes'] = nbytes
+        lines = []
+        for region, stats in stats.items():
+            if not (stats['hits'] or stats['misses'] or stats['entries'] or stats.get('disk_entries')):
+                continue
+            line = (f"{REGIONS[region]}: попаданий {stats['hits']}, промахов {stats['misses']}, "
+                    f"в памяти {stats['entries']} ({format_bytes(stats['bytes'])})")
+            if 'disk_entries' in stats:
+                line += f", на диске {stats['disk_entries']} ({format_bytes(stats['disk_bytes'])})"
+            lines.append(line)
+        self.cache_label.setText('\n'.join(lines) if lines else "Кэш пуст")
         
+    def refresh_timings(self):
+        """Обновляет панель с последними замерами"""
+        spans = tracer.recent(6)
+        if not spans:
+            return
+        lines = [format_span(record) for record in spans]
+        counters = tracer.counters()
+        if counters:
+            lines.append(' | '.join(f'{name}: {value}' for name, value in sorted(counters.items())))
+        self.timings_label.setText('\n'.join(lines))
+
+    def export_trace(self):
+        """Сохраняет трассировку для офлайн-анализа (chrome://tracing, Perfetto)"""
+        path = tracer.export_chrome_trace()
+        print(f'Трассировка сохранена: {path}')
+        self.status_label.setText(f"✅ Трассировка сохранена: {path}")
+        self.status_label.setStyleSheet(self.green_style)
+
     def plot_elbow_def(self):
         """Указываем на ошибку в plot_elbow"""
         print('min_num_clusters должно быть < max_num_clusters')
@@ -0,0 +1,247 @@
+"""Бенчмарк этапов MLModels на синтетических данных.
+
+Генерирует таблицы клиентов со схемой data/client_data_apdated.csv
+(по умолчанию 4k, 100k, 1M и 10M строк), замеряет время и пиковую память
+каждого этапа и пишет результаты в JSON. Память — резидентная (RSS)
+процесса, включая разделяемую память и отображенные в память файлы;
+каждый размер считается в отдельном процессе. С --compare сравнивает с прошлым
+прогоном и отмечает регрессии времени и пиковой памяти (код возврата 1).
+
+Примеры:
+    python benchmarks/bench_pipeline.py --sizes 4000 100000 --output bench.json
+    python benchmarks/bench_pipeline.py --sizes 4000 100000 --compare bench.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from data_store import data_store  # noqa: E402
+from elbow_cache import elbow_cache  # noqa: E402
+from ml_models import MLModels  # noqa: E402
+
+SIZES = [4_000, 100_000, 1_000_000, 10_000_000]
+CONTINUOUS = ['age', 'experience', 'income', 'family', 'mortgage']
+CATEGORICAL = ['personal_loan', 'creditcard', 'loan_delinquency', 'non_valid_passport',
+               'undergraduate_edu', 'graduate_edu', 'advance_edu']
+# Меньший прирост пиковой памяти при сравнении прогонов не учитывается
+MIN_PEAK_MB = 5.0
+GENERATE_CHUNK = 1_000_000
+# Период опроса RSS во время этапа, секунды
+RSS_INTERVAL = 0.005
+
+
+def generate_chunk(rng, n) -> pd.DataFrame:
+    """Синтетические клиенты с распределениями, близкими к исходным данным"""
+    age = rng.integers(18, 66, n)
+    experience = np.clip(age - 22 + rng.integers(-3, 4, n), -3, 43)
+    edu = rng.integers(0, 3, n)
+    mortgage = np.where(rng.random(n) < 0.31, rng.integers(100, 6351, n), 0)
+    return pd.DataFrame({
+        'age': age,
+        'experience': experience,
+        'income': rng.integers(10, 351, n),
+        'family': rng.integers(1, 6, n),
+        'mortgage': mortgage,
+        'personal_loan': (rng.random(n) < 0.10).astype(np.int64),
+        'creditcard': (rng.random(n) < 0.10).astype(np.int64),
+        'loan_delinquency': (rng.random(n) < 0.026).astype(np.int64),
+        'non_valid_passport': (rng.random(n) < 0.005).astype(np.int64),
+        'undergraduate_edu': (edu == 0).astype(np.int64),
+        'graduate_edu': (edu == 1).astype(np.int64),
+        'advance_edu': (edu == 2).astype(np.int64),
+    })
+
+
+def generate_dataset(path, n_rows, seed=0):
+    """Пишет CSV порциями, чтобы генерация 10M строк не требовала много памяти"""
+    rng = np.random.default_rng(seed)
+    written = 0
+    with open(path, 'w', newline='') as f:
+        while written < n_rows:
+            n = min(GENERATE_CHUNK, n_rows - written)
+            generate_chunk(rng, n).to_csv(f, index=False, header=written == 0)
+            written += n
+
+
+def current_rss():
+    """Текущая резидентная память процесса в байтах (None, если ее не узнать)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # без /proc — пиковая RSS процесса (macOS — в байтах, Linux — в КБ)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class PeakRss:
+    """Опрашивает RSS в фоновом потоке и запоминает максимум.
+
+    В отличие от tracemalloc видит разделяемую память и отображенные в
+    память файлы и не замедляет сам замеряемый код.
+    """
+
+    def __init__(self, interval=RSS_INTERVAL):
+        self.interval = interval
+        self.before = self.peak = current_rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        rss = current_rss()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+
+def measure(stages, name, fn):
+    """Время и пик резидентной памяти одного этапа (прирост и абсолютный пик)"""
+    with PeakRss() as rss:
+        start = time.perf_counter()
+        result = fn()
+        seconds = time.perf_counter() - start
+    stages[name] = {'seconds': round(seconds, 4),
+                    'peak_mb': None if rss.peak is None else round((rss.peak - rss.before) / 2 ** 20, 2),
+                    'rss_mb': None if rss.peak is None else round(rss.peak / 2 ** 20, 2)}
+    return result
+
+
+def bench_size(n_rows, k_range, k, features, n_jobs):
+    stages = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        # Модули пишут кэши и запуски в data/ относительно текущего каталога
+        os.makedirs(os.path.join(work_dir, 'data'))
+        path = os.path.join(work_dir, 'data', 'clients.csv')
+        generate_dataset(path, n_rows)
+
+        cwd = os.getcwd()
+        os.chdir(work_dir)
+        try:
+            elbow_cache.clear()
+            models = MLModels(path)
+            langs = {name: 1 for name in features}
+            measure(stages, 'load', lambda: models.data)
+            measure(stages, 'scaler_data', lambda: models.scaler_data(langs, {}))
+            measure(stages, 'for_plot_elbow', lambda: models.for_plot_elbow(k_range, n_jobs=n_jobs))
+            measure(stages, 'for_plot_cluster_graph', lambda: models.for_plot_cluster_graph(k))
+            measure(stages, 'load_profiles', lambda: models.load_profiles(features))
+        finally:
+            os.chdir(cwd)
+            elbow_cache.clear()
+            data_store.invalidate(path)
+    return stages
+
+
+def compare(results, baseline, threshold, memory_threshold=None):
+    """Этапы, ставшие медленнее (seconds) или прожорливее (peak_mb) baseline.
+
+    Время сравнивается с допуском threshold, пиковый прирост памяти — с
+    memory_threshold (по умолчанию тем же). Прирост меньше MIN_PEAK_MB не
+    сравнивается: это шум сборщика мусора и аллокатора.
+    """
+    limits = {'seconds': threshold,
+              'peak_mb': threshold if memory_threshold is None else memory_threshold}
+    regressions = []
+    for size, stages in results.items():
+        for stage, value in stages.items():
+            old = baseline.get('results', {}).get(size, {}).get(stage)
+            if old is None:
+                continue
+            for metric, limit in limits.items():
+                before, after = old.get(metric), value.get(metric)
+                if before is None or after is None or before <= 0:
+                    continue
+                if metric == 'peak_mb' and max(before, after) < MIN_PEAK_MB:
+                    continue
+                ratio = after / before
+                if ratio > 1 + limit:
+                    regressions.append({'size': size, 'stage': stage, 'metric': metric, 'old': before,
+                                        'new': after, 'ratio': round(ratio, 2)})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Бенчмарк этапов MLModels')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='Размеры таблиц в строках')
+    parser.add_argument('--features', default=','.join(CONTINUOUS + CATEGORICAL),
+                        help='Признаки через запятую')
+    parser.add_argument('--elbow', type=int, nargs=2, default=(2, 6), metavar=('K_MIN', 'K_MAX'))
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--jobs', type=int, default=1)
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', help='JSON прошлого прогона для поиска регрессий')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Допустимое замедление (0.2 = 20%%)')
+    parser.add_argument('--memory-threshold', type=float, default=None,
+                        help='Допустимый рост пиковой памяти (по умолчанию как --threshold)')
+    args = parser.parse_args(argv)
+    features = [name.strip() for name in args.features.split(',') if name.strip()]
+
+    results = {}
+    for n_rows in args.sizes:
+        print(f'{n_rows} строк...', file=sys.stderr)
+        # отдельный процесс на размер: память прошлых размеров и кэши не влияют на замер
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+            results[str(n_rows)] = pool.submit(bench_size, n_rows, range(*args.elbow), args.k,
+                                               features, args.jobs).result()
+
+    report = {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'sklearn': sklearn.__version__,
+            'cpu_count': os.cpu_count(),
+            'features': features,
+            'elbow': list(args.elbow),
+            'k': args.k,
+            'jobs': args.jobs,
+        },
+        'results': results,
+    }
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            report['regressions'] = compare(results, json.load(f), args.threshold,
+                                            args.memory_threshold)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 1 if report.get('regressions') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""Массовое отнесение клиентов из большого файла к кластерам сохраненного запуска.
+
+Пример:
+    python bulk_scoring.py --input new_clients.csv --output labels.csv --jobs 8 --distances --pca
+
+Главный процесс только режет файл на блоки байтов по границам строк и
+пишет готовые байты результата в исходном порядке. Разбор CSV,
+масштабирование, отнесение к ближайшему центроиду (одно матричное
+умножение) и форматирование результата выполняются в пуле процессов.
+Переобучения нет. Итог (строки, время, строк в секунду) выводится в
+stdout в JSON. Поля со строками, переносами внутри кавычек, не
+поддерживаются (в данных клиентов их нет).
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import tracer
+from parallel_sweep import default_workers
+from pipeline import load_pipeline
+from run_store import run_store, labels_dtype
+from streaming import DEFAULT_CHUNKSIZE
+
+# Сколько байт читается для оценки средней длины строки
+SAMPLE_BYTES = 1024 * 1024
+
+# Состояние процесса-воркера (один конвейер на процесс)
+_worker = None
+
+
+def score_chunk(pipeline, chunk, with_distances=False, with_pca=False) -> pd.DataFrame:
+    """Номера кластеров порции (и при необходимости расстояния и координаты PCA)"""
+    scaled = pipeline.transform(chunk)
+    distances = pipeline.distances(scaled)
+    labels = distances.argmin(axis=1)
+    result = pd.DataFrame({'cluster_KMeans': labels.astype(labels_dtype(len(pipeline.centroids)))},
+                          index=chunk.index)
+    if with_distances:
+        result['distance'] = np.sqrt(distances[np.arange(len(labels)), labels]).astype(np.float32)
+    if with_pca:
+        coords = pipeline.pca.transform(scaled).astype(np.float32)
+        for i in range(coords.shape[1]):
+            result[f'pca_{i + 1}'] = coords[:, i]
+    return result
+
+
+def output_columns(pipeline, with_distances=False, with_pca=False) -> list:
+    """Столбцы выходного файла (заголовок пишется до первого блока)"""
+    columns = ['cluster_KMeans']
+    if with_distances:
+        columns.append('distance')
+    if with_pca:
+        columns += [f'pca_{i + 1}' for i in range(pipeline.pca.n_components_)]
+    return columns
+
+
+def _init_worker(run_id, header, with_distances, with_pca):
+    global _worker
+    from threadpoolctl import threadpool_limits
+
+    # каждый процесс считает свой блок в одно ядро, а не все процессы во все ядра
+    threadpool_limits(1)
+    _worker = (load_pipeline(run_id), header, with_distances, with_pca)
+
+
+def _score_block(block) -> tuple:
+    """Разбирает блок строк CSV и возвращает (число строк, готовые байты результата)"""
+    pipeline, header, with_distances, with_pca = _worker
+    chunk = pd.read_csv(io.BytesIO(header + block), usecols=pipeline.features)
+    result = score_chunk(pipeline, chunk, with_distances, with_pca)
+    return len(result), result.to_csv(index=False, header=False).encode('utf-8')
+
+
+def iter_blocks(f, block_bytes):
+    """Блоки файла примерно по block_bytes байт, разрезанные по границам строк"""
+    tail = b''
+    while True:
+        data = f.read(block_bytes)
+        if not data:
+            break
+        data = tail + data
+        cut = data.rfind(b'\n') + 1
+        if cut == 0:
+            tail = data
+            continue
+        tail = data[cut:]
+        yield data[:cut]
+    if tail.strip():
+        yield tail + b'\n'
+
+
+def _block_bytes(f, chunksize) -> int:
+    """Размер блока в байтах, соответствующий примерно chunksize строкам"""
+    position = f.tell()
+    sample = f.read(SAMPLE_BYTES)
+    f.seek(position)
+    lines = sample.count(b'\n')
+    line_bytes = len(sample) / lines if lines else len(sample) or 1
+    return max(int(line_bytes * chunksize), 1)
+
+
+def score_file(input_path, output_path, run_id=None, chunksize=DEFAULT_CHUNKSIZE, n_workers=None,
+               with_distances=False, with_pca=False, progress=None) -> dict:
+    """Относит все строки input_path к кластерам и пишет результат в output_path (CSV).
+
+    Блоки примерно по chunksize строк считаются параллельно в n_workers
+    процессах (по умолчанию — по числу ядер), в обработке одновременно не
+    больше 2 * n_workers блоков. progress(rows) вызывается после записи
+    каждого блока.
+    """
+    run_id = run_id or run_store.latest_id()
+    pipeline = load_pipeline(run_id)
+    if with_pca and pipeline.pca is None:
+        raise ValueError('PCA не был обучен для этого запуска')
+    n_workers = n_workers or default_workers()
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    tmp_path = f'{output_path}.{os.getpid()}.tmp'
+
+    rows = 0
+    start = time.perf_counter()
+    try:
+        with tracer.span('bulk_scoring', path=input_path), open(input_path, 'rb') as f, \
+                open(tmp_path, 'wb') as out:
+            header = f.readline()
+            out.write((','.join(output_columns(pipeline, with_distances, with_pca)) + '\n').encode('utf-8'))
+            block_bytes = _block_bytes(f, chunksize)
+            # spawn вместо fork: форк процесса с потоками Qt небезопасен
+            with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=_init_worker,
+                                     initargs=(run_id, header, with_distances, with_pca)) as pool:
+                pending = deque()
+
+                def write_next():
+                    nonlocal rows
+                    n, data = pending.popleft().result()
+                    out.write(data)
+                    rows += n
+                    if progress is not None:
+                        progress(rows)
+
+                try:
+                    for block in iter_blocks(f, block_bytes):
+                        pending.append(pool.submit(_score_block, block))
+                        if len(pending) >= 2 * n_workers:
+                            write_next()
+                    while pending:
+                        write_next()
+                except BaseException:
+                    for future in pending:
+                        future.cancel()
+                    raise
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    seconds = time.perf_counter() - start
+    tracer.count('bulk_scoring.rows', rows)
+    return {'input': input_path, 'output': output_path, 'run_id': run_id,
+            'rows': rows, 'seconds': round(seconds, 3),
+            'rows_per_sec': round(rows / seconds) if seconds > 0 else None, 'workers': n_workers}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Smart Segmenter: массовое отнесение клиентов к кластерам')
+    parser.add_argument('--input', required=True, help='CSV с клиентами')
+    parser.add_argument('--output', required=True, help='CSV для результата')
+    parser.add_argument('--run-id', help='Запуск сегментации (по умолчанию последний)')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help='Примерный размер блока в строках')
+    parser.add_argument('--jobs', type=int, default=None, help='Число процессов (по умолчанию по числу ядер)')
+    parser.add_argument('--distances', action='store_true', help='Добавить расстояние до центроида')
+    parser.add_argument('--pca', action='store_true', help='Добавить координаты PCA')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        report = score_file(args.input, args.output, args.run_id, args.chunksize, args.jobs,
+                            args.distances, args.pca)
+    except (OSError, ValueError, KeyError) as e:
+        print(json.dumps({'error': str(e)}, ensure_ascii=False), file=sys.stderr)
+        return 1
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,250 @@
+import glob
+import mmap
+import os
+import shutil
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+MEMORY_BUDGET = 512 * 1024 * 1024
+DISK_BUDGET = 1024 * 1024 * 1024
+
+# Области кэша и их подписи в административной панели
+REGIONS = {
+    'datasets': 'Датасеты',
+    'scaled': 'Масштабированные столбцы',
+    'models': 'Модели',
+    'projections': 'Проекции PCA',
+    'profiles': 'Агрегаты профилей',
+    'column_stats': 'Статистики столбцов',
+}
+
+MISSING = object()
+
+
+def _is_mapped(array) -> bool:
+    """Отображен ли массив в память из файла (такие данные не занимают кучу)"""
+    base = array
+    while isinstance(base, np.ndarray):
+        if isinstance(base, np.memmap):
+            return True
+        base = base.base
+    return isinstance(base, mmap.mmap)
+
+
+def nbytes_of(value, _seen=None) -> int:
+    """Оценка занимаемой значением памяти (массивы, DataFrame, модели sklearn)"""
+    if _seen is None:
+        _seen = set()
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+    if isinstance(value, np.ndarray):
+        return 0 if _is_mapped(value) else value.nbytes
+    if isinstance(value, pd.DataFrame):
+        return sum(nbytes_of(value[name].to_numpy(), _seen) for name in value.columns)
+    if isinstance(value, dict):
+        return sum(nbytes_of(v, _seen) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(nbytes_of(v, _seen) for v in value)
+    if hasattr(value, '__dict__'):
+        return sys.getsizeof(value) + nbytes_of(vars(value), _seen)
+    return sys.getsizeof(value)
+
+
+class MemoryTier:
+    """Общий для всех областей LRU-кэш в памяти с бюджетом в байтах.
+
+    При превышении бюджета вытесняются давно не использованные записи
+    любых областей.
+    """
+
+    def __init__(self, max_bytes=MEMORY_BUDGET):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._stats = {region: {'hits': 0, 'misses': 0, 'evictions': 0} for region in REGIONS}
+        self._lock = threading.Lock()
+
+    def get(self, region, key, default=MISSING):
+        with self._lock:
+            entry = self._entries.get((region, key))
+            if entry is None:
+                self._stats[region]['misses'] += 1
+                return default
+            self._entries.move_to_end((region, key))
+            self._stats[region]['hits'] += 1
+            return entry[0]
+
+    def put(self, region, key, value, nbytes=None):
+        nbytes = nbytes_of(value) if nbytes is None else nbytes
+        with self._lock:
+            old = self._entries.pop((region, key), None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[(region, key)] = (value, nbytes)
+            self._bytes += nbytes
+            # последнюю запись не вытесняем, даже если она одна больше бюджета
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                (old_region, _), (_, old_bytes) = self._entries.popitem(last=False)
+                self._bytes -= old_bytes
+                self._stats[old_region]['evictions'] += 1
+        return value
+
+    def discard(self, region, key):
+        with self._lock:
+            entry = self._entries.pop((region, key), None)
+            if entry is not None:
+                self._bytes -= entry[1]
+
+    def clear(self, regions=None):
+        with self._lock:
+            for region, key in list(self._entries):
+                if regions is None or region in regions:
+                    self._bytes -= self._entries.pop((region, key))[1]
+
+    def stats(self) -> dict:
+        with self._lock:
+            result = {region: dict(counts, entries=0, bytes=0) for region, counts in self._stats.items()}
+            for (region, _), (_, nbytes) in self._entries.items():
+                result[region]['entries'] += 1
+                result[region]['bytes'] += nbytes
+        return result
+
+
+class DiskTier:
+    """Файлы кэшей на диске, зарегистрированные по областям.
+
+    Единица хранения — путь без расширения: файлы ключа с разными
+    расширениями (например, .npy и .pkl) вытесняются вместе. Области
+    с evictable=False (поколоночный кэш датасетов) не вытесняются
+    автоматически, только очищаются по запросу.
+    """
+
+    def __init__(self, max_bytes=DISK_BUDGET):
+        self.max_bytes = max_bytes
+        self._regions = {}
+        self._lock = threading.Lock()
+
+    def register(self, region, root, patterns=('*',), evictable=True, on_clear=None):
+        self._regions[region] = {'root': root, 'patterns': patterns,
+                                 'evictable': evictable, 'on_clear': on_clear}
+
+    def _units(self, region) -> dict:
+        """{путь без расширения: (mtime, размер, [пути])}"""
+        spec = self._regions[region]
+        units = {}
+        for pattern in spec['patterns']:
+            for path in glob.glob(os.path.join(spec['root'], pattern)):
+                if path.endswith('.tmp'):
+                    continue
+                try:
+                    mtime, size = _path_usage(path)
+                except OSError:
+                    continue
+                unit = os.path.splitext(path)[0]
+                old_mtime, old_size, paths = units.get(unit, (0, 0, []))
+                units[unit] = (max(old_mtime, mtime), old_size + size, paths + [path])
+        return units
+
+    def usage(self) -> dict:
+        """{область: (число записей, байт)}"""
+        result = {}
+        for region in self._regions:
+            units = self._units(region)
+            result[region] = (len(units), sum(size for _, size, _ in units.values()))
+        return result
+
+    def evict(self):
+        """Удаляет давно не использованные записи сверх бюджета"""
+        with self._lock:
+            units = []
+            total = 0
+            for region, spec in self._regions.items():
+                for mtime, size, paths in self._units(region).values():
+                    total += size
+                    if spec['evictable']:
+                        units.append((mtime, size, paths))
+            for _, size, paths in sorted(units):
+                if total <= self.max_bytes:
+                    break
+                for path in paths:
+                    _remove(path)
+                total -= size
+
+    def clear(self, regions=None):
+        with self._lock:
+            for region, spec in self._regions.items():
+                if regions is not None and region not in regions:
+                    continue
+                for _, _, paths in self._units(region).values():
+                    for path in paths:
+                        _remove(path)
+                if spec['on_clear'] is not None:
+                    spec['on_clear']()
+
+
+def _path_usage(path):
+    st = os.stat(path)
+    if not os.path.isdir(path):
+        return st.st_mtime, st.st_size
+    mtime, size = st.st_mtime, 0
+    for dirpath, _, names in os.walk(path):
+        for name in names:
+            try:
+                file_st = os.stat(os.path.join(dirpath, name))
+            except OSError:
+                continue
+            mtime = max(mtime, file_st.st_mtime)
+            size += file_st.st_size
+    return mtime, size
+
+
+def _remove(path):
+    try:
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.remove(path)
+    except OSError:
+        pass
+
+
+class CacheManager:
+    """Двухуровневый кэш дорогих артефактов: память (LRU по байтам) и диск"""
+
+    def __init__(self, memory_bytes=MEMORY_BUDGET, disk_bytes=DISK_BUDGET):
+        self.memory = MemoryTier(memory_bytes)
+        self.disk = DiskTier(disk_bytes)
+
+    def stats(self) -> dict:
+        """Статистика по областям: попадания, промахи, записи и объем в памяти и на диске"""
+        result = self.memory.stats()
+        for region, (entries, nbytes) in self.disk.usage().items():
+            result[region]['disk_entries'] = entries
+            result[region]['disk_bytes'] = nbytes
+        return result
+
+    def clear(self, memory=True, disk=False, regions=None):
+        """Очищает выбранные уровни (и области; по умолчанию все)"""
+        if memory:
+            self.memory.clear(regions)
+        if disk:
+            self.disk.clear(regions)
+
+
+def format_bytes(n) -> str:
+    if n < 1024:
+        return f'{n} Б'
+    for unit in ('КБ', 'МБ'):
+        n /= 1024
+        if n < 1024:
+            return f'{n:.1f} {unit}'
+    return f'{n / 1024:.1f} ГБ'
+
+
+# Создаем глобальный экземпляр для использования в приложении
+cache_manager = CacheManager()
@@ -0,0 +1,184 @@
+"""Консольный запуск сегментации без GUI (для ночных задач на серверах).
+
+Пример:
+    python cli.py --input data/client_data_apdated.csv --features age,income,family \\
+        --elbow 2 11 --k 5 --output-dir out --jobs 4
+
+Результаты (номера кластеров, профили, метод локтя) пишутся в --output-dir,
+тайминги и метрики выводятся в stdout в формате JSON. PyQt6 не
+импортируется, matplotlib — только при --plot.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from clustering_engines import AUTO, ENGINES
+from ml_models import MLModels
+from run_store import load_cluster_labels
+from streaming import DEFAULT_CHUNKSIZE
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Smart Segmenter: сегментация клиентов без GUI')
+    parser.add_argument('--input', default='data/client_data_apdated.csv', help='CSV с данными клиентов')
+    parser.add_argument('--output-dir', default='out', help='Каталог для результатов')
+    parser.add_argument('--features', required=True,
+                        help='Признаки для кластеризации через запятую (например, age,income)')
+    parser.add_argument('--k', type=int, required=True, help='Итоговое число кластеров')
+    parser.add_argument('--elbow', type=int, nargs=2, metavar=('K_MIN', 'K_MAX'),
+                        help='Построить метод локтя для k в [K_MIN, K_MAX)')
+    parser.add_argument('--quality-metrics', action='store_true',
+                        help='Для метода локтя также посчитать силуэт, Davies–Bouldin и Calinski–Harabasz')
+    parser.add_argument('--engine', default=AUTO, choices=[AUTO, *ENGINES],
+                        help='Алгоритм кластеризации (auto — по размеру данных)')
+    parser.add_argument('--jobs', type=int, default=1, help='Число процессов для метода локтя')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Потоковый режим MiniBatchKMeans для данных, не помещающихся в память')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                        help='Размер порции в потоковом режиме')
+    parser.add_argument('--plot', action='store_true', help='Сохранить графики в PNG')
+    parser.add_argument('--metrics-out', help='Дополнительно записать JSON с метриками в файл')
+    args = parser.parse_args(argv)
+
+    args.features = [name.strip() for name in args.features.split(',') if name.strip()]
+    if not args.features:
+        parser.error('не выбрано ни одного признака')
+    if args.elbow is not None and args.elbow[0] >= args.elbow[1]:
+        parser.error('K_MIN должно быть < K_MAX')
+    if args.streaming and args.elbow is not None:
+        parser.error('метод локтя недоступен в потоковом режиме')
+    return args
+
+
+class Timings:
+    """Замер длительности этапов"""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = round(time.perf_counter() - start, 4)
+
+
+def save_plots(output_dir, elbow, pca_features, labels):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    if elbow:
+        fig, ax = plt.subplots()
+        ax.plot(list(elbow), list(elbow.values()), 'bo-')
+        ax.set_xlabel('Number of clusters')
+        ax.set_ylabel('Inertia')
+        ax.set_title('Elbow Method')
+        fig.savefig(os.path.join(output_dir, 'elbow.png'))
+        plt.close(fig)
+
+    if pca_features is not None:
+        fig, ax = plt.subplots()
+        ax.scatter(pca_features[:, 0], pca_features[:, 1], c=labels, cmap='viridis', alpha=0.6)
+        ax.set_xlabel('PCA Component 1')
+        ax.set_ylabel('PCA Component 2')
+        ax.set_title('Кластеризация клиентов (KMeans)')
+        fig.savefig(os.path.join(output_dir, 'clusters.png'))
+        plt.close(fig)
+
+
+def run(args) -> dict:
+    os.makedirs(args.output_dir, exist_ok=True)
+    timings = Timings()
+    models = MLModels(args.input, engine=args.engine)
+    elbow = {}
+    pca_features = None
+
+    if args.streaming:
+        with timings.stage('streaming_fit'):
+            _, sizes = models.stream_segmentation(args.features, args.k, args.chunksize)
+        labels = None
+        engine = 'minibatch'
+    else:
+        with timings.stage('load'):
+            columns = set(models.data.columns)
+        unknown = [name for name in args.features if name not in columns]
+        if unknown:
+            raise ValueError(f'Неизвестные признаки: {", ".join(unknown)}')
+
+        with timings.stage('scaling'):
+            models.scaler_data({name: 1 for name in args.features}, {})
+
+        if args.elbow is not None:
+            k_range = range(*args.elbow)
+            with timings.stage('elbow'):
+                inertia = models.for_plot_elbow(k_range, n_jobs=args.jobs, metrics=args.quality_metrics)
+            elbow = dict(zip(k_range, inertia))
+
+        engine = models.resolve_engine(args.k)
+        with timings.stage('fit'):
+            pca_features, data = models.for_plot_cluster_graph(args.k)
+        labels = data['cluster_KMeans'].to_numpy()
+        sizes = np.bincount(labels, minlength=args.k)
+
+    with timings.stage('profiles'):
+        cluster_summary, _, _ = models.load_profiles(args.features)
+
+    with timings.stage('export'):
+        cluster_summary.to_csv(os.path.join(args.output_dir, 'profiles.csv'))
+        if labels is None:
+            labels = np.asarray(load_cluster_labels(models.run_id))
+        pd.Series(labels, name='cluster_KMeans').to_csv(
+            os.path.join(args.output_dir, 'clusters.csv'), index=False)
+        if elbow:
+            with open(os.path.join(args.output_dir, 'elbow.json'), 'w', encoding='utf-8') as f:
+                json.dump({str(k): v for k, v in elbow.items()}, f, indent=2)
+
+    if args.plot:
+        with timings.stage('plot'):
+            save_plots(args.output_dir, elbow, pca_features, labels)
+
+    return {
+        'input': args.input,
+        'output_dir': args.output_dir,
+        'run_id': models.run_id,
+        'features': args.features,
+        'k': args.k,
+        'engine': engine,
+        'rows': int(sizes.sum()),
+        'timings': timings.stages,
+        'metrics': {
+            'inertia': models.inertia,
+            'cluster_sizes': [int(size) for size in sizes],
+            'elbow': {str(k): v for k, v in elbow.items()},
+            'elbow_quality': {str(k): v for k, v in models.elbow_metrics.items()},
+        },
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        report = run(args)
+    except (OSError, ValueError) as e:
+        print(json.dumps({'error': str(e)}, ensure_ascii=False), file=sys.stderr)
+        return 1
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if args.metrics_out:
+        with open(args.metrics_out, 'w', encoding='utf-8') as f:
+            f.write(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+import numpy as np
+
+# Размер стратифицированной выборки для силуэта (точный силуэт — O(n²))
+SILHOUETTE_SAMPLE = 10_000
+METRIC_NAMES = ('silhouette', 'davies_bouldin', 'calinski_harabasz')
+# Порция строк при расчете расстояний до центроидов
+CHUNK_ROWS = 100_000
+
+
+def assign(features, centroids):
+    """Номера ближайших центроидов и расстояния до них (порциями)"""
+    centroids = np.asarray(centroids, dtype=np.float64)
+    norms = (centroids ** 2).sum(axis=1)
+    labels = np.empty(len(features), dtype=np.intp)
+    distances = np.empty(len(features))
+    for start in range(0, len(features), CHUNK_ROWS):
+        chunk = np.asarray(features[start:start + CHUNK_ROWS], dtype=np.float64)
+        d = (chunk ** 2).sum(axis=1)[:, None] - 2.0 * chunk @ centroids.T + norms
+        labels[start:start + len(chunk)] = d.argmin(axis=1)
+        distances[start:start + len(chunk)] = d[np.arange(len(chunk)), labels[start:start + len(chunk)]]
+    return labels, np.sqrt(np.maximum(distances, 0.0))
+
+
+def stratified_sample(labels, size=SILHOUETTE_SAMPLE, random_state=42) -> np.ndarray:
+    """Индексы выборки, в которой доли кластеров те же, что в данных.
+
+    В каждом кластере берется не меньше двух точек (если они есть),
+    иначе силуэт для маленьких кластеров не определен.
+    """
+    labels = np.asarray(labels)
+    if len(labels) <= size:
+        return np.arange(len(labels))
+    rng = np.random.default_rng(random_state)
+    counts = np.bincount(labels)
+    quota = np.minimum(counts, np.maximum(np.round(counts * size / len(labels)).astype(np.intp), 2))
+    order = np.argsort(labels, kind='stable')
+    starts = np.r_[0, np.cumsum(counts)[:-1]]
+    parts = [rng.choice(order[start:start + count], n, replace=False)
+             for start, count, n in zip(starts, counts, quota) if n > 0]
+    return np.sort(np.concatenate(parts))
+
+
+def quality_metrics(features, labels, centroids, inertia, sample_size=SILHOUETTE_SAMPLE,
+                    random_state=42) -> dict:
+    """Силуэт (по выборке), Davies–Bouldin и Calinski–Harabasz для разбиения.
+
+    Davies–Bouldin и Calinski–Harabasz считаются по центроидам и инерции
+    обучения за один проход по данным, без попарных расстояний.
+    """
+    from sklearn.metrics import silhouette_score
+
+    labels = np.asarray(labels, dtype=np.intp)
+    centroids = np.asarray(centroids, dtype=np.float64)
+    n, k = len(labels), len(centroids)
+    counts = np.bincount(labels, minlength=k)
+    if k < 2 or np.count_nonzero(counts) < 2 or n <= k:
+        return dict.fromkeys(METRIC_NAMES, float('nan'))
+
+    # Среднее расстояние точек кластера до его центроида
+    distances = np.empty(n)
+    for start in range(0, n, CHUNK_ROWS):
+        chunk = np.asarray(features[start:start + CHUNK_ROWS], dtype=np.float64)
+        diff = chunk - centroids[labels[start:start + len(chunk)]]
+        distances[start:start + len(chunk)] = np.sqrt((diff ** 2).sum(axis=1))
+    present = counts > 0
+    scatter = np.bincount(labels, weights=distances, minlength=k)[present] / counts[present]
+    centers = centroids[present]
+    separation = np.sqrt(((centers[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = (scatter[:, None] + scatter[None, :]) / separation
+    np.fill_diagonal(ratio, -np.inf)
+    davies_bouldin = float(np.nan_to_num(ratio, posinf=0.0).max(axis=1).mean())
+
+    mean = (counts[:, None] * centroids).sum(axis=0) / n
+    between = float((counts * ((centroids - mean) ** 2).sum(axis=1)).sum())
+    n_present = int(present.sum())
+    calinski_harabasz = (between / (n_present - 1)) / (inertia / (n - n_present)) if inertia > 0 else 1.0
+
+    sample = stratified_sample(labels, sample_size, random_state)
+    silhouette = float(silhouette_score(np.asarray(features[sample]), labels[sample]))
+    return {'silhouette': silhouette, 'davies_bouldin': davies_bouldin,
+            'calinski_harabasz': float(calinski_harabasz)}
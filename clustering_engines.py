@@ -0,0 +1,181 @@
+"""Алгоритмы кластеризации с общим интерфейсом и выбор алгоритма по размеру данных.
+
+Каждый алгоритм создается по имени (make_engine) и ведет себя как KMeans
+из sklearn: fit / fit_predict / predict, после обучения есть labels_,
+cluster_centers_ и inertia_. Поэтому конвейер сегментации (центроиды),
+кэш метода локтя и метрики качества работают с любым из них.
+Режим 'auto' выбирает алгоритм по числу строк, признаков и кластеров.
+"""
+import numpy as np
+
+from cluster_metrics import assign
+
+AUTO = 'auto'
+# До стольких строк KMeans с несколькими стартами считается быстро
+SMALL_ROWS = 10_000
+# Начиная со стольких строк полный KMeans заменяется на MiniBatchKMeans
+LARGE_ROWS = 200_000
+# Elkan ускоряет KMeans за счет неравенства треугольника только при малой размерности
+ELKAN_MAX_FEATURES = 32
+# При большом k делением пополам обучается быстрее, чем k центроидов сразу
+BISECTING_MIN_K = 16
+# Выборка для оценки радиуса плотностной кластеризации
+EPS_SAMPLE = 10_000
+
+
+class Engine:
+    """Алгоритм из реестра: название для интерфейса и фабрика модели"""
+
+    def __init__(self, name, title, factory, uses_k=True):
+        self.name = name
+        self.title = title
+        self.factory = factory
+        # False — число кластеров алгоритм находит сам (метод локтя не применим)
+        self.uses_k = uses_k
+
+
+ENGINES = {}
+
+
+def register_engine(name, title, factory, uses_k=True) -> Engine:
+    """Добавляет алгоритм: factory(k, random_state, n_init) возвращает модель"""
+    engine = ENGINES[name] = Engine(name, title, factory, uses_k)
+    return engine
+
+
+def _lloyd(k, random_state, n_init):
+    from sklearn.cluster import KMeans
+    return KMeans(n_clusters=k, random_state=random_state, n_init=n_init, algorithm='lloyd')
+
+
+def _elkan(k, random_state, n_init):
+    from sklearn.cluster import KMeans
+    return KMeans(n_clusters=k, random_state=random_state, n_init=n_init, algorithm='elkan')
+
+
+def _minibatch(k, random_state, n_init):
+    from sklearn.cluster import MiniBatchKMeans
+    # каждый старт MiniBatchKMeans проходит по данным, поэтому стартов не больше трех
+    return MiniBatchKMeans(n_clusters=k, random_state=random_state, n_init=min(n_init, 3),
+                           batch_size=4096)
+
+
+def _bisecting(k, random_state, n_init):
+    from sklearn.cluster import BisectingKMeans
+    # n_init — число попыток на каждое деление, а не на всю модель
+    return BisectingKMeans(n_clusters=k, random_state=random_state, n_init=min(n_init, 3),
+                           bisecting_strategy='largest_cluster')
+
+
+class DensityClustering:
+    """Плотностная кластеризация DBSCAN с поиском соседей по kd-дереву.
+
+    Число кластеров определяется данными (k не используется). Радиус eps,
+    если не задан, оценивается по расстояниям до min_samples-го соседа на
+    выборке. Выбросы относятся к ближайшему центроиду, поэтому у каждого
+    клиента есть сегмент, а новые клиенты (predict) относятся к кластерам
+    так же, как в остальных алгоритмах — по ближайшему центроиду.
+    """
+
+    def __init__(self, n_clusters=None, eps=None, min_samples=None, eps_quantile=0.5,
+                 random_state=42):
+        self.n_clusters = n_clusters
+        self.eps = eps
+        self.min_samples = min_samples
+        self.eps_quantile = eps_quantile
+        self.random_state = random_state
+
+    def _estimate_eps(self, features, min_samples) -> float:
+        from sklearn.neighbors import NearestNeighbors
+
+        rng = np.random.default_rng(self.random_state)
+        sample = features
+        if len(features) > EPS_SAMPLE:
+            sample = features[np.sort(rng.choice(len(features), EPS_SAMPLE, replace=False))]
+        neighbors = NearestNeighbors(n_neighbors=min(min_samples, len(sample)), algorithm='kd_tree')
+        distances, _ = neighbors.fit(sample).kneighbors(sample)
+        eps = float(np.quantile(distances[:, -1], self.eps_quantile))
+        # на дискретных признаках у многих точек есть точные дубликаты
+        return eps if eps > 0 else float(distances[distances > 0].min(initial=1.0))
+
+    def fit(self, features, y=None, sample_weight=None):
+        from sklearn.cluster import DBSCAN
+
+        features = np.asarray(features)
+        min_samples = self.min_samples or max(2 * features.shape[1], 5)
+        self.eps_ = self.eps or self._estimate_eps(features, min_samples)
+        labels = DBSCAN(eps=self.eps_, min_samples=min_samples,
+                        algorithm='kd_tree').fit_predict(features, sample_weight=sample_weight)
+
+        clusters = np.unique(labels[labels >= 0])
+        if len(clusters) == 0:
+            # плотных областей нет: все клиенты — один сегмент
+            labels = np.zeros(len(features), dtype=np.intp)
+            clusters = np.zeros(1, dtype=np.intp)
+        # номера кластеров подряд с нуля
+        labels = np.where(labels >= 0, np.searchsorted(clusters, labels), -1)
+        k = len(clusters)
+        core = labels >= 0
+        counts = np.bincount(labels[core], minlength=k)
+        centers = np.zeros((k, features.shape[1]))
+        np.add.at(centers, labels[core], features[core])
+        self.cluster_centers_ = centers / counts[:, None]
+
+        noise = ~core
+        if noise.any():
+            labels[noise], _ = assign(features[noise], self.cluster_centers_)
+        self.labels_ = labels
+        self.n_clusters_ = k
+        diff = features - self.cluster_centers_[labels]
+        self.inertia_ = float(np.einsum('ij,ij->', diff, diff, dtype=np.float64))
+        return self
+
+    def fit_predict(self, features, y=None, sample_weight=None):
+        return self.fit(features, sample_weight=sample_weight).labels_
+
+    def predict(self, features):
+        return assign(features, self.cluster_centers_)[0]
+
+
+def _density(k, random_state, n_init):
+    return DensityClustering(random_state=random_state)
+
+
+register_engine('lloyd', 'KMeans (Lloyd)', _lloyd)
+register_engine('elkan', 'KMeans (Elkan)', _elkan)
+register_engine('minibatch', 'MiniBatchKMeans', _minibatch)
+register_engine('bisecting', 'BisectingKMeans', _bisecting)
+register_engine('density', 'DBSCAN (kd-дерево)', _density, uses_k=False)
+
+
+def select_engine(n_rows, n_features, k=None) -> str:
+    """Алгоритм для режима 'auto' по размеру данных.
+
+    Небольшие данные — обычный KMeans; средние — Elkan при малой
+    размерности (или BisectingKMeans при большом k); большие — MiniBatchKMeans.
+    Плотностная кластеризация автоматически не выбирается: ей нужен
+    подобранный радиус и она не строит кластеры для заданного k.
+    """
+    if n_rows <= SMALL_ROWS:
+        return 'lloyd'
+    if n_rows >= LARGE_ROWS:
+        return 'minibatch'
+    if k is not None and k >= BISECTING_MIN_K:
+        return 'bisecting'
+    return 'elkan' if n_features <= ELKAN_MAX_FEATURES else 'lloyd'
+
+
+def resolve_engine(name, n_rows, n_features, k=None) -> str:
+    """Имя алгоритма из реестра ('auto' заменяется выбранным по размеру данных)"""
+    if name is None or name == AUTO:
+        return select_engine(n_rows, n_features, k)
+    if name not in ENGINES:
+        raise ValueError(f'Неизвестный алгоритм кластеризации: {name}')
+    return name
+
+
+def make_engine(name, k, random_state=42, n_init=10):
+    """Необученная модель алгоритма name для k кластеров"""
+    if name not in ENGINES:
+        raise ValueError(f'Неизвестный алгоритм кластеризации: {name}')
+    return ENGINES[name].factory(k, random_state, n_init)
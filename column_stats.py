@@ -0,0 +1,105 @@
+import numpy as np
+
+from cache_manager import cache_manager
+from instrumentation import tracer
+
+# Число базовых бинов для непрерывных столбцов; целочисленные столбцы с
+# небольшим диапазоном хранятся точно — по бину на каждое значение
+BASE_BINS = 1024
+MAX_EXACT_BINS = 4096
+QUANTILES = np.linspace(0, 1, 1001)
+
+
+class ColumnStats:
+    """Сводка одного столбца, из которой гистограммы и boxplot строятся
+    за время, не зависящее от числа строк.
+
+    Хранит min/max, мелкую базовую гистограмму (ее можно перегруппировать
+    в любое число бинов) и набор квантилей; при наличии номеров кластеров —
+    то же отдельно по каждому кластеру.
+    """
+
+    def __init__(self, name, values, labels=None):
+        values = np.asarray(values, dtype=np.float64)
+        self.name = name
+        self.count = len(values)
+        self.min = float(values.min())
+        self.max = float(values.max())
+
+        is_integer = np.array_equal(values, np.round(values))
+        if is_integer and self.max - self.min + 1 <= MAX_EXACT_BINS:
+            self.base_edges = np.arange(self.min - 0.5, self.max + 1.5)
+        else:
+            self.base_edges = np.linspace(self.min, self.max, BASE_BINS + 1)
+        self.base_centers = (self.base_edges[:-1] + self.base_edges[1:]) / 2
+        n_base = len(self.base_centers)
+
+        base_index = np.clip(np.searchsorted(self.base_edges, values, side='right') - 1, 0, n_base - 1)
+        self.base_counts = np.bincount(base_index, minlength=n_base)
+        self.quantiles = np.quantile(values, QUANTILES)
+
+        self.clusters = []
+        self.cluster_counts = {}
+        self.cluster_quantiles = {}
+        if labels is not None:
+            labels = np.asarray(labels, dtype=np.intp)
+            order = np.argsort(labels, kind='stable')
+            sorted_labels = labels[order]
+            sorted_values = values[order]
+            sorted_index = base_index[order]
+            bounds = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1], True])
+            for start, end in zip(bounds[:-1], bounds[1:]):
+                cluster = int(sorted_labels[start])
+                self.clusters.append(cluster)
+                self.cluster_counts[cluster] = np.bincount(sorted_index[start:end], minlength=n_base)
+                self.cluster_quantiles[cluster] = np.quantile(sorted_values[start:end], QUANTILES)
+
+    def histogram(self, bins, cluster=None):
+        """Гистограмма на bins равных интервалов из базовой (counts, edges)"""
+        counts = self.base_counts if cluster is None else self.cluster_counts[cluster]
+        edges = np.linspace(self.min, self.max, bins + 1)
+        target = np.clip(np.searchsorted(edges, self.base_centers, side='right') - 1, 0, bins - 1)
+        return np.bincount(target, weights=counts, minlength=bins), edges
+
+    def box_stats(self, cluster=None, label=None) -> dict:
+        """Статистики для Axes.bxp по набору квантилей (правило 1.5 IQR)"""
+        q = self.quantiles if cluster is None else self.cluster_quantiles[cluster]
+        q1, med, q3 = np.interp([0.25, 0.5, 0.75], QUANTILES, q)
+        iqr = q3 - q1
+        low, high = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+        whislo = q[q >= low].min()
+        whishi = q[q <= high].max()
+        # выбросы представлены значениями из набора квантилей
+        fliers = np.unique(q[(q < whislo) | (q > whishi)])
+        return {'med': med, 'q1': q1, 'q3': q3, 'whislo': whislo, 'whishi': whishi,
+                'fliers': fliers, 'label': label if label is not None else self.name}
+
+
+def build_column_stats(data, group_column='cluster_KMeans') -> dict:
+    """Сводки по всем столбцам (один раз на загрузку данных)"""
+    labels = data[group_column].to_numpy() if group_column in data.columns else None
+    return {name: ColumnStats(name, data[name].to_numpy(),
+                              labels if name != group_column else None)
+            for name in data.columns}
+
+
+class ColumnStatsCache:
+    """Сводки столбцов по паре (данные, запуск сегментации) в общем кэше в памяти"""
+
+    region = 'column_stats'
+
+    def get(self, data, fingerprint, run_id) -> dict:
+        key = (fingerprint, run_id)
+        stats = cache_manager.memory.get(self.region, key, None)
+        if stats is not None:
+            return stats
+        with tracer.span('column_stats.build', rows=len(data)):
+            stats = build_column_stats(data)
+        return cache_manager.memory.put(self.region, key, stats)
+
+    def clear(self):
+        cache_manager.memory.clear([self.region])
+
+
+# Создаем глобальный экземпляр для использования в приложении
+column_stats_cache = ColumnStatsCache()
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+from cache_manager import cache_manager
+from instrumentation import tracer
+from schema import SCHEMA_VERSION, apply_schema
+
+COLUMNAR_DIR = 'data/columnar'
+
+
+def file_stat(path):
+    """Быстрая сигнатура файла: время изменения и размер"""
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def file_hash(path, block_size=1 << 20):
+    """Хэш содержимого файла (читается блоками, без загрузки целиком)"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ColumnarCache:
+    """Бинарный поколоночный кэш CSV-файлов (по одному .npy на столбец).
+
+    CSV разбирается один раз (столбцы приводятся к компактным типам из
+    schema.py); далее столбцы читаются через memory-map, и
+    загрузка только нужных столбцов занимает миллисекунды. Кэш
+    пересобирается, когда меняется содержимое исходного файла.
+    """
+
+    def __init__(self, root=COLUMNAR_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        # Кэш не вытесняется по объему: его столбцы открыты через memory-map.
+        # При очистке сбрасываются и загруженные датасеты в памяти
+        cache_manager.disk.register('datasets', root, evictable=False,
+                                    on_clear=lambda: cache_manager.memory.clear(['datasets']))
+
+    def _dir(self, path):
+        path = os.path.abspath(path)
+        name = os.path.splitext(os.path.basename(path))[0]
+        suffix = hashlib.blake2b(path.encode('utf-8'), digest_size=4).hexdigest()
+        return os.path.join(self.root, f'{name}-{suffix}')
+
+    def _read_manifest(self, cache_dir):
+        try:
+            with open(os.path.join(cache_dir, 'manifest.json'), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_manifest(self, cache_dir, manifest):
+        path = os.path.join(cache_dir, 'manifest.json')
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def ensure(self, path) -> dict:
+        """Возвращает актуальный манифест кэша, при необходимости пересобирая его"""
+        cache_dir = self._dir(path)
+        with self._lock:
+            stat = list(file_stat(path))
+            manifest = self._read_manifest(cache_dir)
+            if manifest is not None and manifest.get('schema') != SCHEMA_VERSION:
+                manifest = None
+            if manifest is not None and manifest['stat'] == stat:
+                return manifest
+
+            digest = file_hash(path)
+            if manifest is not None and manifest['hash'] == digest:
+                manifest['stat'] = stat
+                self._write_manifest(cache_dir, manifest)
+                return manifest
+
+            return self._build(path, cache_dir, stat, digest)
+
+    def _build(self, path, cache_dir, stat, digest):
+        with tracer.span('csv.load', path=path):
+            frame = apply_schema(pd.read_csv(path))
+        version_dir = os.path.join(cache_dir, digest)
+        tmp_dir = f'{version_dir}.{os.getpid()}.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        files = {}
+        with tracer.span('columnar.write', columns=len(frame.columns)):
+            for i, column in enumerate(frame.columns):
+                values = frame[column].to_numpy()
+                file_name = f'{i}.npy'
+                np.save(os.path.join(tmp_dir, file_name), values, allow_pickle=values.dtype == object)
+                files[column] = file_name
+
+        shutil.rmtree(version_dir, ignore_errors=True)
+        os.replace(tmp_dir, version_dir)
+        manifest = {'source': os.path.abspath(path), 'stat': stat, 'hash': digest,
+                    'version': digest, 'schema': SCHEMA_VERSION, 'n_rows': len(frame),
+                    'columns': list(frame.columns), 'files': files}
+        self._write_manifest(cache_dir, manifest)
+
+        # Старые версии больше не нужны (открытые memory-map остаются валидными)
+        for name in os.listdir(cache_dir):
+            if name != digest and name != 'manifest.json' and not name.endswith('.tmp'):
+                shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+        return manifest
+
+    def load_column(self, path, manifest, column) -> np.ndarray:
+        """Столбец через memory-map (только для чтения)"""
+        file_path = os.path.join(self._dir(path), manifest['version'], manifest['files'][column])
+        try:
+            return np.load(file_path, mmap_mode='r')
+        except ValueError:
+            # столбцы с объектами (строки) не отображаются в память
+            return np.load(file_path, allow_pickle=True)
+
+    def load(self, path, columns=None) -> pd.DataFrame:
+        """Загружает только нужные столбцы (по умолчанию все)"""
+        manifest = self.ensure(path)
+        names = manifest['columns'] if columns is None else list(columns)
+        return pd.DataFrame({name: self.load_column(path, manifest, name) for name in names}, copy=False)
+
+    def clear(self):
+        """Удаляет весь поколоночный кэш (и загруженные из него датасеты)"""
+        with self._lock:
+            cache_manager.clear(memory=True, disk=True, regions=['datasets'])
+
+
+# Создаем глобальный экземпляр для использования в приложении
+columnar_cache = ColumnarCache()
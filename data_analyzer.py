@@ -1,15 +1,52 @@
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout,
                              QLabel, QPushButton, QGroupBox, QSpinBox, QMessageBox,
-                             QSizePolicy, QComboBox)
+                             QSizePolicy, QComboBox, QCheckBox)
 from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-import pandas as pd
 import matplotlib.pyplot as plt 
 
+from data_store import data_store, CLIENT_DATA_PATH, CLUSTERS_PATH
+from run_store import run_store, load_cluster_labels, StaleRunError
+from column_stats import column_stats_cache
+from schema import baseline_nbytes
+from instrumentation import tracer
+from jobs import Job
+from lod_plot import LodScatter
+
+
+def load_data_job(job, file_name):
+    """Фоновая задача: загрузка данных, номеров кластеров и сводок столбцов.
+
+    Номера кластеров берутся из последнего запуска по этому файлу. Возвращает
+    (data, stats, warning); warning — текст, если подходящих номеров кластеров
+    нет (тогда данные загружаются без них).
+    """
+    run_id = run_store.latest_id(file_name)
+    data = data_store.get(file_name)
+    fingerprint = data_store.fingerprint(file_name)
+    warning = None
+    try:
+        data['cluster_KMeans'] = load_cluster_labels(run_id, n_rows=len(data), fingerprint=fingerprint,
+                                                     data_path=file_name)
+        if run_id is None:
+            fingerprint += ':' + data_store.fingerprint(CLUSTERS_PATH)
+    except (StaleRunError, FileNotFoundError) as e:
+        warning = str(e)
+        # сводки без кластеров не зависят от запуска
+        run_id = None
+    job.set_message('Расчет статистик столбцов...')
+    stats = column_stats_cache.get(data, fingerprint, run_id)
+    return data, stats, warning
+
+
 class DataAnalyzer(QWidget):
     def __init__(self):
         super().__init__()
         self.data = None
+        self.column_stats = {}
+        self.load_job = None
+        self.notify_on_load = False
+        self.scatter_lod = None
         self.initUI()
         
     def initUI(self):
@@ -30,7 +67,7 @@ class DataAnalyzer(QWidget):
         
         # Кнопки загрузки данных
         self.load_btn = QPushButton('🔄 Обновить данные')
-        self.load_btn.clicked.connect(self.load_data)
+        self.load_btn.clicked.connect(lambda: self.load_data(notify=True))
         control_layout.addWidget(self.load_btn)
         
         # Статистика данных
@@ -88,7 +125,7 @@ class DataAnalyzer(QWidget):
         # Инициализация параметров графика
         self.update_chart_options()
         
-        # Загружаем данных
+        # Загружаем данные в фоне, не блокируя открытие окна
         self.load_data()
         
     def update_chart_options(self):
@@ -112,6 +149,9 @@ class DataAnalyzer(QWidget):
             self.bins_spin.setRange(5, 100)
             self.bins_spin.setValue(20)
             self.params_layout.addWidget(self.bins_spin)
+
+            self.hist_by_cluster = QCheckBox('По кластерам')
+            self.params_layout.addWidget(self.hist_by_cluster)
             
             plot_btn = QPushButton('Построить гистограмму')
             plot_btn.clicked.connect(self.plot_histogram)
@@ -143,6 +183,9 @@ class DataAnalyzer(QWidget):
             if self.data is not None:
                 self.box_column_combo.addItems(self.data.columns.tolist())
             self.params_layout.addWidget(self.box_column_combo)
+
+            self.box_by_cluster = QCheckBox('По кластерам')
+            self.params_layout.addWidget(self.box_by_cluster)
             
             plot_btn = QPushButton('Построить Boxplot')
             plot_btn.clicked.connect(self.plot_boxplot)
@@ -150,25 +193,49 @@ class DataAnalyzer(QWidget):
         
         self.params_layout.addStretch()
         
-    def load_data(self):
-        try:
-            file_name = 'data/client_data_apdated.csv'
-            df_0 = pd.read_csv(file_name)
-            data_clusters = pd.read_csv('data/client_data_clusters.csv')
-            self.data = pd.concat([df_0, data_clusters], axis=1)
-            self.canvas.data = self.data
-            self.update_data_stats()
-            self.update_chart_options()
+    def load_data(self, notify=False):
+        """Запускает загрузку данных в фоне (окно с сообщением — только по кнопке)"""
+        if self.load_job is not None:
+            return
+        self.notify_on_load = notify
+        self.load_btn.setEnabled(False)
+        self.info_label.setText('Загрузка данных...')
+        self.load_job = Job(load_data_job, CLIENT_DATA_PATH)
+        self.load_job.signals.result.connect(self.on_data_loaded)
+        self.load_job.signals.error.connect(self.on_load_error)
+        self.load_job.signals.finished.connect(self.on_load_finished)
+        self.load_job.start()
+
+    def on_data_loaded(self, result):
+        file_name = CLIENT_DATA_PATH
+        self.data, self.column_stats, warning = result
+        self.canvas.data = self.data
+        self.update_data_stats()
+        self.update_chart_options()
+        if warning is not None:
+            self.info_label.setText(f'Данные загружены из файла: {file_name} (без кластеров: {warning})')
+        else:
             self.info_label.setText(f'Данные загружены из файла: {file_name}')
+        if self.notify_on_load:
             QMessageBox.information(self, 'Успех', f'Данные успешно загружены!\nЗаписей: {len(self.data)}')
-        except Exception as e:
-            QMessageBox.critical(self, 'Ошибка', f'Не удалось загрузить данные: {str(e)}')
+
+    def on_load_error(self, text):
+        self.info_label.setText(f'Не удалось загрузить данные: {text}')
+        if self.notify_on_load:
+            QMessageBox.critical(self, 'Ошибка', f'Не удалось загрузить данные: {text}')
+
+    def on_load_finished(self):
+        self.load_job = None
+        self.load_btn.setEnabled(True)
             
     def update_data_stats(self):
         if self.data is not None:
+            memory = self.data.memory_usage(deep=True).sum()
+            baseline = baseline_nbytes(self.data)
             stats_text = (f'Записей: {len(self.data)} | '
                          f'Столбцов: {len(self.data.columns)} | '
-                         f'Память: {self.data.memory_usage(deep=True).sum() / 1024:.1f} KB')
+                         f'Память: {memory / 1024:.1f} KB '
+                         f'(в int64: {baseline / 1024:.1f} KB, в {baseline / memory:.1f} раза меньше)')
             self.stats_label.setText(stats_text)
             
             # Вывод основных статистик в консоль
@@ -179,14 +246,23 @@ class DataAnalyzer(QWidget):
         if self.data is not None:
             column = self.column_combo.currentText()
             bins = self.bins_spin.value()
+            stats = self.column_stats[column]
             self.figure.clear()
             ax = self.figure.add_subplot(111)
-            # plot data
-            ax.hist(self.data[column], bins, color='skyblue', edgecolor='black')
+            # plot data: бины собираются из готовой базовой гистограммы
+            if self.hist_by_cluster.isChecked() and stats.clusters:
+                for cluster in stats.clusters:
+                    counts, edges = stats.histogram(bins, cluster)
+                    ax.stairs(counts, edges, label=f'Кластер {cluster}')
+                ax.legend()
+            else:
+                counts, edges = stats.histogram(bins)
+                ax.stairs(counts, edges, fill=True, color='skyblue', edgecolor='black')
             ax.set_xlabel(bins)
             ax.set_ylabel(column)
             # refresh canvas
-            self.canvas.draw()
+            with tracer.span('canvas.draw'):
+                self.canvas.draw()
             self.info_label.setText(f'Построена гистограмма для столбца "{column}" с {bins} бинами')
             
     def plot_scatter(self):
@@ -196,25 +272,33 @@ class DataAnalyzer(QWidget):
             self.figure.clear()
             # plot data
             ax = self.figure.add_subplot(111)
-            ax.scatter(self.data[x_column], self.data[y_column])
+            # для больших данных рисуется карта плотности (см. lod_plot)
+            self.scatter_lod = LodScatter(ax, self.data[x_column].to_numpy(), self.data[y_column].to_numpy())
             ax.set_xlabel(x_column)
             ax.set_ylabel(y_column)
             # refresh canvas
-            self.canvas.draw()
-            self.info_label.setText(f'Построена диаграмма рассеяния: {x_column} vs {y_column}')
+            with tracer.span('canvas.draw'):
+                self.canvas.draw()
+            self.info_label.setText(f'Построена диаграмма рассеяния: {x_column} vs {y_column} '
+                                    f'({self.scatter_lod.description()})')
             
     def plot_boxplot(self):
         if self.data is not None:
             column = self.box_column_combo.currentText()
+            stats = self.column_stats[column]
             self.figure.clear()
-            # plot data
+            # plot data: квартили и усы берутся из набора квантилей
             ax = self.figure.add_subplot(111)
-            ax.boxplot(self.data[column])
+            if self.box_by_cluster.isChecked() and stats.clusters:
+                ax.bxp([stats.box_stats(cluster, label=str(cluster)) for cluster in stats.clusters])
+            else:
+                ax.bxp([stats.box_stats(label='1')])
             ax.set_xlabel("Группы данных")
             ax.set_ylabel("Значения")
 
             # refresh canvas
-            self.canvas.draw()
+            with tracer.span('canvas.draw'):
+                self.canvas.draw()
             self.info_label.setText(f'Построен Boxplot для столбца "{column}"')
             
 data_analyzer = DataAnalyzer
\ No newline at end of file
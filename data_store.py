@@ -0,0 +1,78 @@
+import os
+import threading
+
+import pandas as pd
+
+from cache_manager import cache_manager
+from columnar_cache import columnar_cache, file_stat
+from instrumentation import tracer
+
+CLIENT_DATA_PATH = 'data/client_data_apdated.csv'
+CLUSTERS_PATH = 'data/client_data_clusters.csv'
+
+
+class DataStore:
+    """Общее для всего процесса хранилище датасетов.
+
+    Файл разбирается один раз на каждое своё изменение. Изменение
+    определяется по mtime/размеру, а если они поменялись — по хэшу
+    содержимого (простое касание файла не приводит к повторному разбору).
+    Данные читаются из поколоночного кэша (см. columnar_cache), столбцы
+    подгружаются по мере обращения. Наружу отдаются только представления
+    только для чтения. Открытые датасеты хранятся в общем кэше в памяти
+    (см. cache_manager).
+    """
+
+    region = 'datasets'
+
+    def __init__(self):
+        self._lock = threading.RLock()
+
+    def _entry(self, path):
+        key = os.path.abspath(path)
+        with self._lock:
+            stat = file_stat(path)
+            entry = cache_manager.memory.get(self.region, key, None)
+            if entry is not None and entry['stat'] == stat:
+                return entry
+
+            manifest = columnar_cache.ensure(path)
+            if entry is not None and entry['hash'] == manifest['hash']:
+                entry['stat'] = stat
+                return entry
+
+            entry = {'stat': stat, 'hash': manifest['hash'], 'manifest': manifest, 'columns': {}}
+            # столбцы отображены в память и не расходуют бюджет кэша
+            return cache_manager.memory.put(self.region, key, entry, nbytes=0)
+
+    def get(self, path=CLIENT_DATA_PATH, columns=None) -> pd.DataFrame:
+        """Возвращает датасет или только нужные столбцы (загружается лениво)"""
+        with self._lock:
+            entry = self._entry(path)
+            names = entry['manifest']['columns'] if columns is None else list(columns)
+            arrays = {}
+            for name in names:
+                if name not in entry['columns']:
+                    tracer.count('data_store.column_loads')
+                    entry['columns'][name] = columnar_cache.load_column(path, entry['manifest'], name)
+                arrays[name] = entry['columns'][name]
+        # Столбцы отображены в память только для чтения: изменить значения
+        # на месте нельзя, а каждый вызов получает свой DataFrame, поэтому
+        # добавленные вызывающим столбцы не затрагивают общий кэш
+        return pd.DataFrame(arrays, copy=False)
+
+    def fingerprint(self, path=CLIENT_DATA_PATH) -> str:
+        """Отпечаток содержимого файла для ключей производных кэшей"""
+        return self._entry(path)['hash']
+
+    def invalidate(self, path=None):
+        """Сбрасывает закэшированный файл (или все файлы)"""
+        with self._lock:
+            if path is None:
+                cache_manager.memory.clear([self.region])
+            else:
+                cache_manager.memory.discard(self.region, os.path.abspath(path))
+
+
+# Создаем глобальный экземпляр для использования в приложении
+data_store = DataStore()
@@ -0,0 +1,76 @@
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+from cache_manager import cache_manager
+
+ELBOW_CACHE_DIR = 'data/elbow_cache'
+
+
+def make_key(fingerprint, features, k, random_state, n_init, engine='lloyd') -> str:
+    """Ключ результата обучения KMeans для метода локтя"""
+    key = [fingerprint, list(features), int(k), random_state, int(n_init)]
+    # ключи KMeans (Lloyd) совпадают с записанными до появления других алгоритмов
+    if engine != 'lloyd':
+        key.append(engine)
+    payload = json.dumps(key)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class ElbowCache:
+    """Кэш инерции, центроидов KMeans и метрик качества: в памяти и на диске в data/.
+
+    Оба уровня общие для всех кэшей приложения (см. cache_manager): память
+    ограничена бюджетом в байтах, диск — общим объемом файлов, вытесняются
+    давно не использованные записи (LRU).
+    """
+
+    region = 'models'
+
+    def __init__(self, cache_dir=ELBOW_CACHE_DIR):
+        self.cache_dir = cache_dir
+        cache_manager.disk.register(self.region, cache_dir, ('*.npz',))
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.npz')
+
+    def get(self, key):
+        """Возвращает (inertia, centroids, metrics) или None; metrics — None, если не считались"""
+        value = cache_manager.memory.get(self.region, ('elbow', key), None)
+        if value is not None:
+            return value
+
+        path = self._path(key)
+        try:
+            with np.load(path) as f:
+                metrics = {name[len('metric_'):]: float(f[name])
+                           for name in f.files if name.startswith('metric_')}
+                value = (float(f['inertia']), f['centroids'], metrics or None)
+            os.utime(path)  # время доступа для LRU на диске
+        except (OSError, KeyError, ValueError):
+            return None
+        return cache_manager.memory.put(self.region, ('elbow', key), value)
+
+    def put(self, key, inertia, centroids, metrics=None):
+        value = (float(inertia), np.asarray(centroids), metrics)
+        cache_manager.memory.put(self.region, ('elbow', key), value)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, inertia=value[0], centroids=value[1],
+                     **{f'metric_{name}': v for name, v in (metrics or {}).items()})
+        os.replace(tmp_path, path)
+        cache_manager.disk.evict()
+
+    def clear(self):
+        """Очищает оба уровня кэша"""
+        cache_manager.clear(memory=True, disk=True, regions=[self.region])
+
+
+# Создаем глобальный экземпляр для использования в приложении
+elbow_cache = ElbowCache()
@@ -0,0 +1,84 @@
+import hashlib
+
+import numpy as np
+
+RESERVOIR_FILE = 'reservoir.npy'
+# Сколько старых строк представляют прошлые данные при дообучении
+RESERVOIR_SIZE = 50_000
+# Размер блока чтения при подписи начала файла
+PREFIX_BLOCK_BYTES = 1024 * 1024
+
+
+def prefix_signature(path, n_rows):
+    """Подпись заголовка и первых n_rows строк CSV: {'bytes': длина, 'hash': blake2b}.
+
+    Перевод строки после последней подписанной строки не входит в подпись,
+    поэтому дописывание строк в файл без завершающего перевода строки ее не
+    меняет. None — в файле меньше n_rows строк.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    remaining = n_rows + 1
+    size = 0
+    last = b''
+    with open(path, 'rb') as f:
+        while remaining > 0:
+            block = f.read(PREFIX_BLOCK_BYTES)
+            if not block:
+                # последняя строка файла без перевода строки
+                if remaining == 1 and last not in (b'', b'\n'):
+                    return {'bytes': size, 'hash': digest.hexdigest()}
+                return None
+            lines = block.count(b'\n')
+            if lines < remaining:
+                digest.update(block)
+                size += len(block)
+                remaining -= lines
+                last = block[-1:]
+                continue
+            end = -1
+            for _ in range(remaining):
+                end = block.find(b'\n', end + 1)
+            digest.update(block[:end])
+            return {'bytes': size + end, 'hash': digest.hexdigest()}
+    return None
+
+
+def update_reservoir(reservoir, n_seen, n_total, size=RESERVOIR_SIZE, random_state=42) -> np.ndarray:
+    """Равномерная выборка номеров строк (алгоритм R) после дописывания строк.
+
+    reservoir — выборка по первым n_seen строкам (None — выборки еще нет,
+    она строится заново по всем n_seen строкам), строки n_seen..n_total-1 —
+    новые. Возвращает выборку не больше size номеров по всем n_total строкам.
+    """
+    rng = np.random.default_rng([random_state, n_total])
+    if reservoir is None:
+        reservoir = np.sort(rng.choice(n_seen, min(size, n_seen), replace=False))
+    reservoir = np.array(reservoir, dtype=np.int64)
+
+    # пока выборка не заполнена, новые строки попадают в нее целиком
+    fill = min(size - len(reservoir), n_total - n_seen)
+    if fill > 0:
+        reservoir = np.concatenate([reservoir, np.arange(n_seen, n_seen + fill)])
+        n_seen += fill
+
+    rows = np.arange(n_seen, n_total)
+    slots = rng.integers(0, rows + 1)
+    keep = slots < size
+    # при повторных попаданиях в одну ячейку остается последняя строка
+    slots, rows = slots[keep][::-1], rows[keep][::-1]
+    slots, first = np.unique(slots, return_index=True)
+    reservoir[slots] = rows[first]
+    return reservoir
+
+
+def warm_start_kmeans(sample, centroids, sample_weight=None, random_state=42, max_iter=100):
+    """KMeans, начатый с центроидов прошлого запуска.
+
+    Один старт без случайной инициализации: кластер i остается кластером i,
+    поэтому номера кластеров не меняются между дообучениями.
+    """
+    from sklearn.cluster import KMeans
+
+    kmeans = KMeans(n_clusters=len(centroids), init=np.asarray(centroids, dtype=sample.dtype),
+                    n_init=1, max_iter=max_iter, random_state=random_state)
+    return kmeans.fit(sample, sample_weight=sample_weight)
@@ -0,0 +1,84 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+TRACE_PATH = 'data/trace.json'
+
+
+class Tracer:
+    """Именованные интервалы времени (spans) и счетчики горячих участков.
+
+    Последние интервалы хранятся в кольцевом буфере; их можно показать в GUI
+    или выгрузить в формате Chrome Trace Event (chrome://tracing, Perfetto,
+    speedscope) для анализа в виде flame graph.
+    """
+
+    def __init__(self, max_spans=5000):
+        self._spans = deque(maxlen=max_spans)
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, **args):
+        """Замеряет время выполнения блока"""
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.perf_counter_ns() - start, **args)
+
+    def add(self, name, start_ns, duration_ns, pid=None, tid=None, **args):
+        """Добавляет уже замеренный интервал (например, из процесса-воркера)"""
+        record = {'name': name, 'start_ns': start_ns, 'duration_ns': duration_ns,
+                  'pid': pid or os.getpid(), 'tid': tid or threading.get_ident(), 'args': args}
+        with self._lock:
+            self._spans.append(record)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def recent(self, n=10) -> list:
+        """Последние n интервалов, новые первыми"""
+        with self._lock:
+            return list(self._spans)[-n:][::-1]
+
+    def counters(self) -> dict:
+        with self._lock:
+            return dict(self._counters)
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+            self._counters.clear()
+
+    def export_chrome_trace(self, path=TRACE_PATH) -> str:
+        """Сохраняет интервалы и счетчики в формате Chrome Trace Event"""
+        with self._lock:
+            spans = list(self._spans)
+            counters = dict(self._counters)
+        events = [{'name': s['name'], 'ph': 'X', 'ts': s['start_ns'] / 1000,
+                   'dur': s['duration_ns'] / 1000, 'pid': s['pid'], 'tid': s['tid'],
+                   'args': s['args']} for s in spans]
+        ts = max((e['ts'] + e['dur'] for e in events), default=0)
+        events += [{'name': name, 'ph': 'C', 'ts': ts, 'pid': os.getpid(), 'args': {name: value}}
+                   for name, value in counters.items()]
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return path
+
+
+def format_span(record) -> str:
+    """Строка для панели статуса: имя и длительность"""
+    return f"{record['name']}: {record['duration_ns'] / 1e6:.1f} мс"
+
+
+# Создаем глобальный экземпляр для использования в приложении
+tracer = Tracer()
@@ -0,0 +1,76 @@
+import threading
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class JobCancelled(Exception):
+    """Задача была отменена пользователем"""
+
+
+class JobSignals(QObject):
+    """Сигналы фоновой задачи (доставляются в GUI-поток)"""
+    message = pyqtSignal(str)
+    progress = pyqtSignal(object)
+    result = pyqtSignal(object)
+    error = pyqtSignal(str)
+    cancelled = pyqtSignal()
+    finished = pyqtSignal()
+
+
+class Job(QRunnable):
+    """Фоновая задача для QThreadPool.
+
+    Функция вызывается как fn(job, *args, **kwargs): через job она сообщает
+    о ходе работы (job.report / job.set_message) и проверяет отмену
+    (job.is_cancelled / job.check_cancelled).
+    """
+
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = JobSignals()
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        """Запрашивает отмену задачи"""
+        self._cancel_event.set()
+
+    def is_cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        """Прерывает задачу, если была запрошена отмена"""
+        if self.is_cancelled():
+            raise JobCancelled()
+
+    def report(self, value):
+        """Промежуточный результат задачи"""
+        self.signals.progress.emit(value)
+
+    def set_message(self, text: str):
+        """Текстовый статус задачи"""
+        self.signals.message.emit(text)
+
+    def start(self):
+        """Запускает задачу в глобальном пуле потоков.
+
+        Сигналы нужно подключить до вызова start, иначе быстрая задача
+        может завершиться раньше, чем появятся обработчики.
+        """
+        QThreadPool.globalInstance().start(self)
+
+    def run(self):
+        try:
+            result = self.fn(self, *self.args, **self.kwargs)
+            self.check_cancelled()
+        except JobCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.error.emit(str(e))
+        else:
+            self.signals.result.emit(result)
+        finally:
+            self.signals.finished.emit()
+
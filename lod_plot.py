@@ -0,0 +1,115 @@
+import numpy as np
+
+# Сколько точек еще рисуем как есть, без уровня детализации
+LOD_THRESHOLD = 50_000
+
+
+class LodScatter:
+    """Диаграмма рассеяния с уровнем детализации для больших данных.
+
+    До threshold точек рисуется обычный scatter. Больше — без цветов
+    строится карта плотности (2D-гистограмма), с номерами кластеров —
+    стратифицированная выборка до per_cluster точек каждого кластера.
+    При масштабировании и сдвиге через NavigationToolbar карта (выборка)
+    пересчитывается только для видимой области.
+
+    Объект нужно хранить, пока виден график: matplotlib держит на
+    обработчики изменения осей только слабые ссылки.
+    """
+
+    def __init__(self, ax, x, y, labels=None, threshold=LOD_THRESHOLD, bins=200,
+                 per_cluster=2000, cmap='viridis', alpha=0.6, seed=0):
+        self.ax = ax
+        self.x = np.asarray(x)
+        self.y = np.asarray(y)
+        self.labels = None if labels is None else np.asarray(labels)
+        self.bins = bins
+        self.per_cluster = per_cluster
+        self.shown = len(self.x)
+
+        if len(self.x) <= threshold:
+            self.mode = 'full'
+            if self.labels is None:
+                self.artist = ax.scatter(self.x, self.y)
+            else:
+                self.artist = ax.scatter(self.x, self.y, c=self.labels, cmap=cmap, alpha=alpha)
+            return
+
+        ax.set_xlim(self.x.min(), self.x.max())
+        ax.set_ylim(self.y.min(), self.y.max())
+        ax.set_autoscale_on(False)
+
+        if self.labels is None:
+            self.mode = 'density'
+            self.artist = ax.imshow(np.zeros((bins, bins)), origin='lower', aspect='auto',
+                                    cmap=cmap, interpolation='nearest',
+                                    extent=(*ax.get_xlim(), *ax.get_ylim()))
+        else:
+            self.mode = 'sample'
+            self.rank = np.random.default_rng(seed).random(len(self.x))
+            self.artist = ax.scatter([], [], c=[], cmap=cmap, alpha=alpha)
+            self._sort_by_labels()
+
+        self.update()
+        ax.callbacks.connect('xlim_changed', self.on_view_changed)
+        ax.callbacks.connect('ylim_changed', self.on_view_changed)
+
+    def _sort_by_labels(self):
+        # Случайный порядок внутри каждого кластера считается один раз;
+        # выборка для области просмотра — первые per_cluster видимых точек
+        order = np.lexsort((self.rank, self.labels))
+        self.x_sorted = self.x[order]
+        self.y_sorted = self.y[order]
+        self.labels_sorted = self.labels[order]
+        self.starts = np.flatnonzero(np.r_[True, self.labels_sorted[1:] != self.labels_sorted[:-1]])
+        self.segment_of = np.repeat(np.arange(len(self.starts)),
+                                    np.diff(np.r_[self.starts, len(order)]))
+        self.artist.set_clim(self.labels.min(), self.labels.max())
+
+    def set_labels(self, labels):
+        """Перекрашивает те же точки новыми номерами кластеров"""
+        self.labels = np.asarray(labels)
+        if self.mode == 'full':
+            self.artist.set_array(self.labels)
+            self.artist.set_clim(self.labels.min(), self.labels.max())
+        elif self.mode == 'sample':
+            self._sort_by_labels()
+            self.update()
+
+    def view(self):
+        x0, x1 = sorted(self.ax.get_xlim())
+        y0, y1 = sorted(self.ax.get_ylim())
+        return x0, x1, y0, y1
+
+    def update(self):
+        """Пересчитывает карту плотности или выборку для текущей области"""
+        x0, x1, y0, y1 = self.view()
+        if self.mode == 'density':
+            counts, _, _ = np.histogram2d(self.x, self.y, bins=self.bins, range=[[x0, x1], [y0, y1]])
+            image = np.log1p(counts.T)
+            self.artist.set_data(image)
+            self.artist.set_extent((x0, x1, y0, y1))
+            self.artist.set_clim(0, max(image.max(), 1))
+            self.shown = int(counts.sum())
+        elif self.mode == 'sample':
+            xs = self.x_sorted
+            ys = self.y_sorted
+            visible = (xs >= x0) & (xs <= x1) & (ys >= y0) & (ys <= y1)
+            seen = np.cumsum(visible)
+            before_segment = np.r_[0, seen][self.starts][self.segment_of]
+            keep = visible & (seen - before_segment <= self.per_cluster)
+            self.artist.set_offsets(np.column_stack([xs[keep], ys[keep]]))
+            self.artist.set_array(self.labels_sorted[keep])
+            self.shown = int(keep.sum())
+
+    def on_view_changed(self, ax):
+        self.update()
+        ax.figure.canvas.draw_idle()
+
+    def description(self) -> str:
+        """Подпись для статуса: что именно сейчас нарисовано"""
+        if self.mode == 'full':
+            return f'показаны все {len(self.x)} точек'
+        if self.mode == 'density':
+            return f'карта плотности по {len(self.x)} точкам'
+        return f'выборка {self.shown} из {len(self.x)} точек (по {self.per_cluster} на кластер)'
@@ -1,13 +1,17 @@
 import sys
+import importlib
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, 
                              QVBoxLayout, QHBoxLayout, QPushButton,
                              QStackedWidget, QLabel, QStatusBar)
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QAction
 
-from admin_screen import AdminScreen
-from profiles_screen import ProfilesScreen
-from data_analyzer import DataAnalyzer
+# Экраны (и тяжелые matplotlib/sklearn) импортируются при первом переходе на них
+SCREENS = {
+    'diagram': ('data_analyzer', 'DataAnalyzer'),
+    'profiles': ('profiles_screen', 'ProfilesScreen'),
+    'admin': ('admin_screen', 'AdminScreen'),
+}
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -36,8 +40,8 @@ class MainWindow(QMainWindow):
         self.create_menu()
         self.create_statusbar()
         
-        # Показываем начальный экран
-        self.show_diagram_screen()
+        # Показываем начальный экран, когда окно уже отрисовано
+        QTimer.singleShot(0, self.show_diagram_screen)
 
     def create_navigation(self):
         """Создает панель навигации"""
@@ -76,20 +80,22 @@ class MainWindow(QMainWindow):
         self.nav_layout.addStretch()
 
     def create_screens(self):
-        """Создает экраны приложения"""
-        # Экран с диаграммами
-        self.diagram_screen = DataAnalyzer()
-        
-        # Экран с профилями клиентов
-        self.profiles_screen = ProfilesScreen()
-        
-        # Экран админки
-        self.admin_screen = AdminScreen()
-        
-        # Добавляем экраны в стек
-        self.content_stack.addWidget(self.diagram_screen)
-        self.content_stack.addWidget(self.profiles_screen)
-        self.content_stack.addWidget(self.admin_screen)
+        """Создает заглушку; сами экраны создаются при первом переходе"""
+        self.screens = {}
+        placeholder = QLabel("Загрузка...")
+        placeholder.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        placeholder.setStyleSheet("font-size: 14pt; color: #666;")
+        self.content_stack.addWidget(placeholder)
+
+    def get_screen(self, name):
+        """Возвращает экран, при первом обращении импортируя модуль и создавая его"""
+        if name not in self.screens:
+            module_name, class_name = SCREENS[name]
+            self.statusBar().showMessage("Загрузка экрана...")
+            screen = getattr(importlib.import_module(module_name), class_name)()
+            self.content_stack.addWidget(screen)
+            self.screens[name] = screen
+        return self.screens[name]
 
     def create_menu(self):
         """Создает строку меню"""
@@ -122,17 +128,17 @@ class MainWindow(QMainWindow):
 
     def show_diagram_screen(self):
         """Показывает экран с диаграммами"""
-        self.content_stack.setCurrentWidget(self.diagram_screen)
+        self.content_stack.setCurrentWidget(self.get_screen('diagram'))
         self.update_status("Просмотр диаграмм")
 
     def show_profiles_screen(self):
         """Показывает экран профилей"""
-        self.content_stack.setCurrentWidget(self.profiles_screen)
+        self.content_stack.setCurrentWidget(self.get_screen('profiles'))
         self.update_status("Просмотр профилей")
 
     def show_admin_screen(self):
         """Показывает экран админки"""
-        self.content_stack.setCurrentWidget(self.admin_screen)
+        self.content_stack.setCurrentWidget(self.get_screen('admin'))
         self.update_status("Административная панель")
 
     def update_status(self, message):
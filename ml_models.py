@@ -1,29 +1,62 @@
-from sklearn.decomposition import PCA
+import os
+
+import numpy as np
 import pandas as pd
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
+
+from data_store import data_store, CLIENT_DATA_PATH, CLUSTERS_PATH
+from run_store import run_store, labels_dtype, load_cluster_labels
+from pipeline import SegmentationPipeline, PIPELINE_FILE, load_pipeline
+from instrumentation import tracer
+from scaled_columns import scaled_columns
+from profile_stats import profile_cache
+from projection_cache import projection_cache
+from parallel_sweep import parallel_elbow, parallel_metrics
+from elbow_cache import elbow_cache, make_key
+from cluster_metrics import assign, quality_metrics
+from clustering_engines import AUTO, ENGINES, make_engine, resolve_engine
+from incremental import RESERVOIR_FILE, prefix_signature, update_reservoir, warm_start_kmeans
+from streaming import (DEFAULT_CHUNKSIZE, fit_scaler_streaming, fit_kmeans_streaming,
+                       assign_streaming)
 
 class MLModels:
-    def __init__(self):
-        self.data = pd.read_csv('data/client_data_apdated.csv')
+    def __init__(self, data_path=CLIENT_DATA_PATH, engine=AUTO):
+        self.data_path = data_path
+        # алгоритм кластеризации из реестра clustering_engines ('auto' — по размеру данных)
+        self.engine = engine
         self.all_features = []
+        self.random_state = 42
+        self.n_init = 10
+        self.run_id = None
+        # (отпечаток данных, признаки) текущей self.scaled_matrix
+        self.scaled_key = None
+        self.inertia = None
+        self.elbow_metrics = {}
+        # (run_id, агрегаты профилей) потокового запуска: без чтения файла целиком
+        self.stream_aggregates = None
         #self.continuous_variables = {}
         #self.categorical_variables = {}
         
     def load_str(self, a: str):
         return a + 'ssdd'
+
+    @property
+    def data(self) -> pd.DataFrame:
+        """Датасет из общего хранилища (разбирается один раз на изменение файла)"""
+        return data_store.get(self.data_path)
     
     def load_dataset(self):
         """Загружаем датасет с данными о клиентах"""
-        data = pd.read_csv('data/client_data_apdated.csv')
+        data = self.data
         return data[0:600]
     
     def scaler_data(self, langs_continuous , langs_categorical):
-        """ Масштабирование признаков """
+        """ Масштабирование признаков
+
+        Столбцы стандартизуются по отдельности и кэшируются (см. scaled_columns):
+        при смене набора признаков считаются только новые столбцы.
+        """
         features_for_clustering = [key for key, value in langs_continuous.items() if value == 1]
         additional_features = [key for key, value in langs_categorical.items() if value == 1]
-        data = self.data
-        scaler = StandardScaler()
         clust_status = True
         
         if features_for_clustering == [] and additional_features == []:
@@ -33,45 +66,301 @@ class MLModels:
             self.all_features = features_for_clustering + additional_features
             clust_status = True
 
-        self.scaled_features = scaler.fit_transform(data[self.all_features])
+        # Масштабированная матрица зависит только от данных и набора признаков
+        key = (data_store.fingerprint(self.data_path), tuple(self.all_features))
+        if key != self.scaled_key:
+            # float32 в разделяемой памяти: воркеры метода локтя подключаются к ней по
+            # self.scaled_matrix.handle без копирования. В кэше лежат только столбцы:
+            # вторая полная копия в том же бюджете вытеснила бы их, и смена одного
+            # признака снова масштабировала бы все. Сегмент освобождается, когда
+            # матрица заменена и больше не используется
+            self.scaler, self.scaled_matrix = scaled_columns.matrix(self.data_path, self.all_features)
+            self.scaled_key = key
+        self.scaled_features = self.scaled_matrix.array
         return clust_status
+
+    def resolve_engine(self, k=None) -> str:
+        """ Алгоритм для текущей матрицы признаков (режим 'auto' — по ее размеру) """
+        n_rows, n_features = self.scaled_features.shape
+        return resolve_engine(self.engine, n_rows, n_features, k)
     
-    def for_plot_elbow(self, k_range):
-        """ Метод локтя """
-        inertia = []
+    def for_plot_elbow(self, k_range, progress=None, should_stop=None, n_jobs=1, metrics=False):
+        """ Метод локтя
+
+        progress(k, inertia, metrics) вызывается после каждого k, should_stop() —
+        перед каждым k; если он вернул True, возвращается уже посчитанная часть.
+        При n_jobs > 1 (или None — по числу ядер) разные k обучаются параллельно
+        в отдельных процессах, подключенных к общей матрице признаков (см.
+        shared_matrix). Уже посчитанные для этих данных и признаков k
+        берутся из кэша, обучаются только недостающие.
+
+        При metrics=True для каждого k считаются силуэт (по выборке),
+        Davies–Bouldin и Calinski–Harabasz (см. cluster_metrics) и сохраняются
+        в self.elbow_metrics; иначе в progress передается None.
+
+        Алгоритм (self.engine) выбирается один раз для всего диапазона k,
+        чтобы точки графика были сравнимы.
+        """
+        engine = self.resolve_engine(max(k_range, default=None))
+        if not ENGINES[engine].uses_k:
+            raise ValueError(f'Метод локтя не применим: {ENGINES[engine].title} сам определяет число кластеров')
+        fingerprint = data_store.fingerprint(self.data_path)
+        keys = {k: make_key(fingerprint, self.all_features, k, self.random_state, self.n_init, engine)
+                for k in k_range}
+        results = {}
+        self.elbow_metrics = {}
+
+        def store(k, inertia, centroids, k_metrics=None):
+            elbow_cache.put(keys[k], inertia, centroids, k_metrics)
+            report(k, inertia, k_metrics)
+
+        def report(k, inertia, k_metrics):
+            results[k] = inertia
+            if k_metrics is not None:
+                self.elbow_metrics[k] = k_metrics
+            if progress is not None:
+                progress(k, inertia, k_metrics)
+
+        parallel = n_jobs is None or n_jobs > 1
+        missing = []
+        unscored = {}
         for k in k_range:
-            kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
-            kmeans.fit(self.scaled_features)
-            inertia.append(kmeans.inertia_)
-        return inertia
+            cached = elbow_cache.get(keys[k])
+            if cached is None:
+                tracer.count('elbow_cache.misses')
+                missing.append(k)
+                continue
+            tracer.count('elbow_cache.hits')
+            inertia, centroids, k_metrics = cached
+            if metrics and k_metrics is None and parallel:
+                unscored[k] = (inertia, centroids)
+            elif metrics and k_metrics is None:
+                # модель уже в кэше: метки по ее центроидам, без переобучения
+                if should_stop is not None and should_stop():
+                    return [results[k] for k in k_range if k in results]
+                with tracer.span('cluster_metrics', k=k):
+                    labels, _ = assign(self.scaled_features, centroids)
+                    k_metrics = quality_metrics(self.scaled_features, labels, centroids, inertia,
+                                                random_state=self.random_state)
+                store(k, inertia, centroids, k_metrics)
+            else:
+                report(k, inertia, k_metrics if metrics else None)
+
+        if unscored:
+            parallel_metrics(self.scaled_matrix, unscored, n_workers=n_jobs,
+                             random_state=self.random_state, on_result=store, should_stop=should_stop)
+            if should_stop is not None and should_stop():
+                return [results[k] for k in k_range if k in results]
+        if missing and parallel:
+            parallel_elbow(self.scaled_matrix, missing, n_workers=n_jobs,
+                           random_state=self.random_state, n_init=self.n_init,
+                           on_result=store, should_stop=should_stop, with_metrics=metrics,
+                           engine=engine)
+        else:
+            for k in missing:
+                if should_stop is not None and should_stop():
+                    break
+                with tracer.span('kmeans.fit', k=k, engine=engine):
+                    kmeans = make_engine(engine, k, self.random_state, self.n_init)
+                    kmeans.fit(self.scaled_features)
+                k_metrics = None
+                if metrics:
+                    with tracer.span('cluster_metrics', k=k):
+                        k_metrics = quality_metrics(self.scaled_features, kmeans.labels_,
+                                                    kmeans.cluster_centers_, kmeans.inertia_,
+                                                    random_state=self.random_state)
+                store(k, kmeans.inertia_, kmeans.cluster_centers_, k_metrics)
+        return [results[k] for k in k_range if k in results]
     
-    def for_plot_cluster_graph(self, optimal_k):
-        """ Кластеризация KMeans """
+    def for_plot_cluster_graph(self, optimal_k, progress=None):
+        """ Кластеризация (KMeans или другой алгоритм из self.engine)
+
+        progress(stage) вызывается перед каждым этапом (для статуса в GUI).
+        Обученный конвейер (scaler + центроиды + PCA) сохраняется вместе с
+        запуском. Плотностный алгоритм сам находит число кластеров, поэтому
+        оно может отличаться от optimal_k.
+        """
         data = self.data
-        kmeans = KMeans(n_clusters=optimal_k, random_state=42, n_init=10)
-        data['cluster_KMeans'] = kmeans.fit_predict(self.scaled_features)
-        data['cluster_KMeans'].to_csv('data/client_data_clusters.csv', index=False)
+        engine = self.resolve_engine(optimal_k)
+        if progress is not None:
+            progress('fit')
+        with tracer.span('kmeans.fit', k=optimal_k, engine=engine):
+            kmeans = make_engine(engine, optimal_k, self.random_state, self.n_init)
+            labels = kmeans.fit_predict(self.scaled_features)
+        n_clusters = len(kmeans.cluster_centers_)
+        labels = labels.astype(labels_dtype(n_clusters))
+        data['cluster_KMeans'] = labels
+        self.inertia = float(kmeans.inertia_)
 
         # Визуализация кластеров (для 2D)
-        pca = PCA(n_components=2)
-        pca_features = pca.fit_transform(self.scaled_features)
+        if progress is not None:
+            progress('pca')
+        # Проекция не зависит от k: при повторной сегментации берется из кэша
+        pca, pca_features = projection_cache.get_or_fit(data_store.fingerprint(self.data_path),
+                                                        self.all_features, self.scaled_features,
+                                                        random_state=self.random_state)
+
+        pipeline = SegmentationPipeline(self.all_features, self.scaler, kmeans.cluster_centers_, pca)
+        with tracer.span('run_store.save'), \
+                run_store.new_run(self.all_features, n_clusters, len(labels),
+                                  fingerprint=data_store.fingerprint(self.data_path),
+                                  data_path=self.data_path) as run:
+            run.labels[:] = labels
+            pipeline.save(run.path(PIPELINE_FILE))
+            run.meta['engine'] = engine
+            run.meta['data_prefix'] = prefix_signature(self.data_path, len(labels))
+        self.run_id = run.run_id
         return pca_features, data
+
+    def predict(self, new_data, run_id=None):
+        """ Номера кластеров для новых клиентов по сохраненному конвейеру (без переобучения) """
+        return load_pipeline(run_id).predict(new_data)
+
+    def transform(self, new_data, run_id=None):
+        """ Координаты новых клиентов в пространстве PCA сохраненного запуска """
+        return load_pipeline(run_id).project(new_data)
+    
+    def stream_segmentation(self, features, optimal_k, chunksize=DEFAULT_CHUNKSIZE):
+        """ Потоковая кластеризация MiniBatchKMeans для данных, не помещающихся в память
+
+        Файл читается порциями: проход для StandardScaler.partial_fit, проход
+        для MiniBatchKMeans.partial_fit и проход для записи номеров кластеров.
+        Память ограничена размером порции, а не числом строк. Агрегаты
+        профилей по выбранным признакам считаются в том же проходе.
+        """
+        self.all_features = list(features) or ['age']
+        with tracer.span('streaming.scaling'):
+            scaler = fit_scaler_streaming(self.data_path, self.all_features, chunksize)
+        with tracer.span('streaming.kmeans.fit', k=optimal_k):
+            kmeans = fit_kmeans_streaming(self.data_path, self.all_features, scaler, optimal_k,
+                                          chunksize, random_state=self.random_state)
+        pipeline = SegmentationPipeline(self.all_features, scaler, kmeans.cluster_centers_)
+        with tracer.span('streaming.assign'), \
+                run_store.new_run(self.all_features, optimal_k, scaler.n_samples_seen_,
+                                  data_path=self.data_path) as run:
+            sizes, self.inertia, aggregates = assign_streaming(self.data_path, self.all_features,
+                                                               scaler, kmeans, run.labels, chunksize)
+            pipeline.save(run.path(PIPELINE_FILE))
+            run.meta['data_prefix'] = prefix_signature(self.data_path, scaler.n_samples_seen_)
+        self.run_id = run.run_id
+        self.stream_aggregates = (run.run_id, aggregates)
+        return kmeans.cluster_centers_, sizes
     
+    def retrain(self, progress=None, chunksize=DEFAULT_CHUNKSIZE) -> dict:
+        """ Дообучение последней модели на строках, дописанных в файл данных
+
+        KMeans стартует с центроидов прошлого запуска и обучается только на
+        новых строках и равномерной выборке старых (reservoir); веса выборки
+        представляют все старые строки. Scaler прошлого запуска не меняется,
+        поэтому номера кластеров сохраняются между дообучениями. Номера
+        кластеров всех строк затем пересчитываются одним проходом по
+        расстояниям до новых центроидов, без обучения.
+        progress(stage) вызывается перед этапами 'fit' и 'assign'.
+
+        Дообучение возможно, только если прошлый запуск построен по этому же
+        файлу и файл с тех пор только дописывался: первые строки сверяются с
+        подписью (prefix_signature) из meta.json запуска. Иначе выбрасывается
+        ValueError — нужна полная сегментация.
+        """
+        run_id = run_store.latest_id(self.data_path)
+        if run_id is None:
+            raise FileNotFoundError('Нет сохраненных запусков для этого файла: сначала выполните сегментацию')
+        meta = run_store.load_meta(run_id)
+        if meta.get('data_path') != os.path.abspath(self.data_path) or meta.get('data_prefix') is None:
+            raise ValueError(f'Запуск {run_id} построен не по файлу {self.data_path} или сохранен без '
+                             'подписи данных: нужна полная сегментация')
+        previous = load_pipeline(run_id)
+        self.all_features = previous.features
+        data = data_store.get(self.data_path, columns=self.all_features)
+        n_old, n_total = meta['n_rows'], len(data)
+        if n_total < n_old:
+            raise ValueError('В файле меньше строк, чем при обучении: нужна полная сегментация')
+        if (meta.get('data_fingerprint') != data_store.fingerprint(self.data_path)
+                and prefix_signature(self.data_path, n_old) != meta['data_prefix']):
+            raise ValueError(f'Первые {n_old} строк файла изменились после обучения (строки не только '
+                             'дописывались): нужна полная сегментация')
+        if n_total == n_old:
+            self.run_id = run_id
+            return {'run_id': run_id, 'parent_run': None, 'new_rows': 0, 'sample_rows': 0}
+
+        try:
+            reservoir = np.load(run_store.run_path(run_id, RESERVOIR_FILE))
+        except OSError:
+            reservoir = update_reservoir(None, n_old, n_old, random_state=self.random_state)
+        rows = np.concatenate([reservoir, np.arange(n_old, n_total)])
+        weights = np.concatenate([np.full(len(reservoir), n_old / max(len(reservoir), 1)),
+                                  np.ones(n_total - n_old)])
+
+        if progress is not None:
+            progress('fit')
+        with tracer.span('retrain.fit', rows=len(rows)):
+            sample = previous.transform(data.take(rows))
+            kmeans = warm_start_kmeans(sample, previous.centroids, sample_weight=weights,
+                                       random_state=self.random_state)
+        pipeline = SegmentationPipeline(self.all_features, previous.scaler, kmeans.cluster_centers_,
+                                        previous.pca)
+
+        if progress is not None:
+            progress('assign')
+        inertia = 0.0
+        with tracer.span('retrain.assign', rows=n_total), \
+                run_store.new_run(self.all_features, meta['k'], n_total,
+                                  fingerprint=data_store.fingerprint(self.data_path),
+                                  data_path=self.data_path) as run:
+            for start in range(0, n_total, chunksize):
+                distances = pipeline.distances(pipeline.transform(data.iloc[start:start + chunksize]))
+                labels = distances.argmin(axis=1)
+                run.labels[start:start + len(labels)] = labels
+                inertia += float(distances[np.arange(len(labels)), labels].sum())
+            pipeline.save(run.path(PIPELINE_FILE))
+            np.save(run.path(RESERVOIR_FILE),
+                    update_reservoir(reservoir, n_old, n_total, random_state=self.random_state))
+            run.meta['parent_run'] = run_id
+            run.meta['data_prefix'] = prefix_signature(self.data_path, n_total)
+        self.run_id = run.run_id
+        self.inertia = inertia
+        return {'run_id': run.run_id, 'parent_run': run_id, 'new_rows': n_total - n_old,
+                'sample_rows': len(rows)}
+
+    def cluster_aggregates(self) -> dict:
+        """ Число клиентов, суммы, средние и дисперсии всех признаков по кластерам
+
+        Считаются за один проход (np.bincount) и кэшируются для запуска.
+        Берется запуск, созданный этим экземпляром (если был), а не последний:
+        другая сессия или сервис могли за это время сохранить свой. Иначе —
+        последний запуск по файлу self.data_path.
+        """
+        run_id = self.run_id or run_store.latest_id(self.data_path)
+        if self.stream_aggregates is not None and self.stream_aggregates[0] == run_id:
+            return self.stream_aggregates[1]
+        data = self.data
+        fingerprint = data_store.fingerprint(self.data_path)
+        labels = load_cluster_labels(run_id, n_rows=len(data), fingerprint=fingerprint,
+                                     data_path=self.data_path)
+        if run_id is None:
+            # старый формат: номера кластеров из CSV тоже могут меняться
+            fingerprint += ':' + data_store.fingerprint(CLUSTERS_PATH)
+        return profile_cache.get(data, labels, run_id, fingerprint)
+
     def load_profiles(self, features_list=None) -> tuple[pd.DataFrame, list, dict]:
         """Создание профилей кластеров"""
         
         # Используем переданные признаки или атрибут класса
         features_to_use = features_list if features_list is not None else self.all_features
         
-        data_clusters = pd.read_csv('data/client_data_clusters.csv')
-        variables_dict_mean = {key: 'mean' for key in features_to_use}
-        result = pd.concat([self.data, data_clusters], axis=1)
-        
-        cluster_summary: pd.DataFrame = result.groupby('cluster_KMeans').agg(variables_dict_mean).round(2)
+        aggregates = self.cluster_aggregates()
+        column_index = [aggregates['columns'].index(key) for key in features_to_use]
+        counts = aggregates['counts']
+        present = np.flatnonzero(counts)
+        total = counts.sum()
+
+        cluster_summary = pd.DataFrame(aggregates['means'][np.ix_(present, column_index)],
+                                       index=pd.Index(present, name='cluster_KMeans'),
+                                       columns=features_to_use).round(2)
 
         # Добавление размера кластера
-        cluster_summary['Size'] = result['cluster_KMeans'].value_counts().sort_index()
-        cluster_summary['Percentage'] = (cluster_summary['Size'] / len(result) * 100).round(2)
+        cluster_summary['Size'] = counts[present]
+        cluster_summary['Percentage'] = (cluster_summary['Size'] / total * 100).round(2)
         
         l = ["Молодые клиенты с низким доходом, редко используют кредитные продукты", "Клиенты предпенсионного возраста со стабильным доходом",
         "Состоятельные клиенты среднего возраста, активно пользующиеся кредитами", "Высокорисковые клиенты с просрочками" ]
@@ -86,9 +375,9 @@ class MLModels:
         
         d = {}
         for cluster_num, description in clusters_descriptions.items():
-            if cluster_num in result['cluster_KMeans'].values:
-                size = len(result[result['cluster_KMeans'] == cluster_num])
-                d[cluster_num] = [f'{description}', size, round(size/len(result)*100, 4)]
+            if cluster_num < len(counts) and counts[cluster_num] > 0:
+                size = int(counts[cluster_num])
+                d[cluster_num] = [f'{description}', size, round(size/total*100, 4)]
         
         return cluster_summary, features_to_use, d
     
@@ -0,0 +1,146 @@
+import multiprocessing
+import os
+import queue
+import time
+
+from cluster_metrics import assign, quality_metrics
+from clustering_engines import make_engine
+from instrumentation import tracer
+from shared_matrix import SharedMatrix
+
+# Матрица признаков, подключенная в процессе-воркере (одна на процесс)
+_worker_matrix = None
+_worker_features = None
+
+
+def default_workers() -> int:
+    """Число процессов по умолчанию — по числу ядер"""
+    return os.cpu_count() or 1
+
+
+def _init_worker(handle, n_threads):
+    """Подключает общую матрицу признаков один раз при старте процесса"""
+    global _worker_matrix, _worker_features
+    from threadpoolctl import threadpool_limits
+
+    _worker_matrix = handle.attach()
+    _worker_features = _worker_matrix.array
+    # Не даем каждому процессу занимать все ядра потоками OpenMP/BLAS
+    threadpool_limits(n_threads)
+
+
+def _fit_k(k, random_state, n_init, with_metrics, engine):
+    start = time.perf_counter_ns()
+    kmeans = make_engine(engine, k, random_state, n_init)
+    kmeans.fit(_worker_features)
+    # Метрики считаются тут же, по меткам обучения, без отдельного прохода в родителе
+    metrics = None
+    if with_metrics:
+        metrics = quality_metrics(_worker_features, kmeans.labels_, kmeans.cluster_centers_,
+                                  kmeans.inertia_, random_state=random_state)
+    # Интервал передается родителю, который добавляет его в свою трассировку
+    span = (start, time.perf_counter_ns() - start, os.getpid())
+    return k, kmeans.inertia_, kmeans.cluster_centers_, metrics, span
+
+
+def _score_k(k, inertia, centroids, random_state):
+    """Метрики качества модели из кэша: метки по ее центроидам, без переобучения"""
+    start = time.perf_counter_ns()
+    labels, _ = assign(_worker_features, centroids)
+    metrics = quality_metrics(_worker_features, labels, centroids, inertia, random_state=random_state)
+    span = (start, time.perf_counter_ns() - start, os.getpid())
+    return k, inertia, centroids, metrics, span
+
+
+def _run_pool(features, tasks, n_workers, on_done, should_stop):
+    """Выполняет задачи (fn, args) в пуле процессов над общей матрицей признаков.
+
+    features — SharedMatrix (воркеры подключаются к ней без копирования) или
+    массив, который копируется в разделяемую память один раз на вызов;
+    матрица не сериализуется для каждой задачи. on_done(result) вызывается
+    по мере готовности (в порядке завершения). Если should_stop() вернул
+    True, процессы-воркеры завершаются сразу, вместе с идущими обучениями.
+    """
+    n_workers = min(n_workers or default_workers(), len(tasks)) or 1
+    n_threads = max(1, default_workers() // n_workers)
+
+    owned = None
+    if not isinstance(features, SharedMatrix):
+        features = owned = SharedMatrix(features)
+    try:
+        # spawn вместо fork: форк процесса с потоками Qt небезопасен;
+        # multiprocessing.Pool, а не ProcessPoolExecutor — его можно terminate()
+        pool = multiprocessing.get_context('spawn').Pool(n_workers, initializer=_init_worker,
+                                                         initargs=(features.handle, n_threads))
+        finished = False
+        try:
+            # результаты приходят из потока пула в порядке завершения
+            results = queue.Queue()
+            for fn, args in tasks:
+                pool.apply_async(fn, args, callback=lambda result: results.put((True, result)),
+                                 error_callback=lambda error: results.put((False, error)))
+            remaining = len(tasks)
+            while remaining:
+                try:
+                    ok, result = results.get(timeout=0.2)
+                except queue.Empty:
+                    ok = None
+                if ok is False:
+                    raise result
+                if ok:
+                    remaining -= 1
+                    on_done(result)
+                if should_stop is not None and should_stop():
+                    break
+            finished = not remaining
+        finally:
+            if finished:
+                pool.close()
+            else:
+                pool.terminate()
+            pool.join()
+    finally:
+        if owned is not None:
+            owned.release()
+
+
+def parallel_elbow(features, k_range, n_workers=None, random_state=42, n_init=10,
+                   on_result=None, should_stop=None, with_metrics=False, engine='lloyd'):
+    """Метод локтя с обучением KMeans для разных k в отдельных процессах.
+
+    features — SharedMatrix или массив (см. _run_pool). on_result(k, inertia,
+    centroids, metrics) вызывается по мере готовности (в порядке завершения),
+    список инерций возвращается в порядке k_range. При with_metrics воркеры
+    сразу считают метрики качества (см. cluster_metrics), иначе metrics —
+    None. engine — алгоритм из реестра clustering_engines.
+    """
+    k_values = list(k_range)
+    results = {}
+
+    def done(result):
+        k, inertia, centroids, metrics, (start, duration, pid) = result
+        tracer.add('kmeans.fit', start, duration, pid=pid, tid=pid, k=k, engine=engine)
+        results[k] = inertia
+        if on_result is not None:
+            on_result(k, inertia, centroids, metrics)
+
+    _run_pool(features, [(_fit_k, (k, random_state, n_init, with_metrics, engine)) for k in k_values],
+              n_workers, done, should_stop)
+    return [results[k] for k in k_values if k in results]
+
+
+def parallel_metrics(features, models, n_workers=None, random_state=42, on_result=None,
+                     should_stop=None):
+    """Метрики качества уже обученных моделей {k: (inertia, centroids)} в отдельных процессах.
+
+    on_result(k, inertia, centroids, metrics) вызывается по мере готовности.
+    """
+    def done(result):
+        k, inertia, centroids, metrics, (start, duration, pid) = result
+        tracer.add('cluster_metrics', start, duration, pid=pid, tid=pid, k=k)
+        if on_result is not None:
+            on_result(k, inertia, centroids, metrics)
+
+    _run_pool(features, [(_score_k, (k, inertia, centroids, random_state))
+                         for k, (inertia, centroids) in models.items()],
+              n_workers, done, should_stop)
@@ -0,0 +1,70 @@
+import pickle
+
+import numpy as np
+
+from cache_manager import cache_manager
+from run_store import run_store
+from schema import feature_matrix
+
+PIPELINE_FILE = 'pipeline.pkl'
+
+
+class SegmentationPipeline:
+    """Обученный конвейер сегментации: StandardScaler + центроиды KMeans + PCA.
+
+    Позволяет отнести новых клиентов к существующим кластерам и спроецировать
+    их в то же пространство PCA без переобучения.
+    """
+
+    def __init__(self, features, scaler, centroids, pca=None):
+        self.features = list(features)
+        self.scaler = scaler
+        self.centroids = np.asarray(centroids, dtype=np.float64)
+        self.pca = pca
+        self._centroid_norms = (self.centroids ** 2).sum(axis=1)
+
+    def transform(self, data) -> np.ndarray:
+        """Масштабирует признаки новых клиентов так же, как при обучении"""
+        return self.scaler.transform(feature_matrix(data, self.features))
+
+    def distances(self, scaled) -> np.ndarray:
+        """Квадраты расстояний до центроидов, матрица (n, k) за одно умножение"""
+        scaled = np.asarray(scaled, dtype=np.float64)
+        d = (scaled ** 2).sum(axis=1)[:, None] - 2.0 * scaled @ self.centroids.T + self._centroid_norms
+        return np.maximum(d, 0.0, out=d)
+
+    def predict(self, data) -> np.ndarray:
+        """Номера ближайших кластеров для пачки клиентов"""
+        return self.distances(self.transform(data)).argmin(axis=1)
+
+    def project(self, data) -> np.ndarray:
+        """Координаты клиентов в пространстве PCA, построенном при обучении"""
+        if self.pca is None:
+            raise ValueError('PCA не был обучен для этого запуска')
+        return self.pca.transform(self.transform(data))
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path) -> 'SegmentationPipeline':
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+
+def _load_run_pipeline(run_id) -> SegmentationPipeline:
+    # Запуски неизменяемы, поэтому конвейер можно держать в памяти по run_id
+    pipeline = cache_manager.memory.get('models', ('pipeline', run_id), None)
+    if pipeline is None:
+        pipeline = cache_manager.memory.put('models', ('pipeline', run_id),
+                                            SegmentationPipeline.load(run_store.run_path(run_id, PIPELINE_FILE)))
+    return pipeline
+
+
+def load_pipeline(run_id=None) -> SegmentationPipeline:
+    """Конвейер последнего (или указанного) запуска"""
+    run_id = run_id or run_store.latest_id()
+    if run_id is None:
+        raise FileNotFoundError('Нет сохраненных запусков сегментации')
+    return _load_run_pipeline(run_id)
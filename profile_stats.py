@@ -0,0 +1,100 @@
+import os
+
+import numpy as np
+
+from cache_manager import cache_manager
+from instrumentation import tracer
+from run_store import run_store
+
+AGGREGATES_FILE = 'aggregates.npz'
+
+
+def compute_aggregates(data, labels) -> dict:
+    """Агрегаты по кластерам для всех столбцов сразу через np.bincount.
+
+    Возвращает число клиентов, суммы, средние и дисперсии (матрицы
+    кластеры x признаки) — без масок по каждому кластеру.
+    """
+    labels = np.asarray(labels, dtype=np.intp)
+    columns = [name for name in data.columns if name != 'cluster_KMeans']
+    n_clusters = int(labels.max()) + 1 if len(labels) else 0
+    counts = np.bincount(labels, minlength=n_clusters)
+
+    sums = np.empty((n_clusters, len(columns)))
+    sumsq = np.empty((n_clusters, len(columns)))
+    for j, name in enumerate(columns):
+        values = data[name].to_numpy(dtype=np.float64)
+        sums[:, j] = np.bincount(labels, weights=values, minlength=n_clusters)
+        sumsq[:, j] = np.bincount(labels, weights=values * values, minlength=n_clusters)
+    return aggregates_from_sums(columns, counts, sums, sumsq)
+
+
+def aggregates_from_sums(columns, counts, sums, sumsq) -> dict:
+    """Агрегаты профилей по накопленным суммам (например, по порциям файла)"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts[:, None]
+        variances = np.maximum(sumsq / counts[:, None] - means ** 2, 0.0)
+    return {'columns': columns, 'counts': counts, 'sums': sums, 'means': means, 'variances': variances}
+
+
+class ProfileCache:
+    """Кэш агрегатов профилей по запуску сегментации.
+
+    Запуски неизменяемы, поэтому агрегаты считаются один раз на пару
+    (запуск, данные) и хранятся в общем кэше в памяти (см. cache_manager)
+    и в каталоге запуска.
+    """
+
+    region = 'profiles'
+
+    def __init__(self):
+        cache_manager.disk.register(self.region, run_store.root, (os.path.join('*', AGGREGATES_FILE),))
+
+    def get(self, data, labels, run_id, fingerprint) -> dict:
+        key = (run_id, fingerprint)
+        aggregates = cache_manager.memory.get(self.region, key, None)
+        if aggregates is not None:
+            return aggregates
+
+        aggregates = self._load(run_id, fingerprint)
+        if aggregates is None:
+            with tracer.span('profiles.aggregate', rows=len(labels)):
+                aggregates = compute_aggregates(data, labels)
+            self._save(run_id, fingerprint, aggregates)
+        return cache_manager.memory.put(self.region, key, aggregates)
+
+    def _load(self, run_id, fingerprint):
+        if run_id is None:
+            return None
+        path = run_store.run_path(run_id, AGGREGATES_FILE)
+        try:
+            with np.load(path) as f:
+                if str(f['fingerprint']) != fingerprint:
+                    return None
+                os.utime(path)  # время доступа для LRU на диске
+                return {'columns': list(f['columns']), 'counts': f['counts'], 'sums': f['sums'],
+                        'means': f['means'], 'variances': f['variances']}
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def _save(self, run_id, fingerprint, aggregates):
+        # Без запуска (старый формат с CSV) агрегаты живут только в памяти
+        if run_id is None:
+            return
+        path = run_store.run_path(run_id, AGGREGATES_FILE)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, fingerprint=fingerprint, columns=np.array(aggregates['columns']),
+                         counts=aggregates['counts'], sums=aggregates['sums'],
+                         means=aggregates['means'], variances=aggregates['variances'])
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def clear(self):
+        cache_manager.memory.clear([self.region])
+
+
+# Создаем глобальный экземпляр для использования в приложении
+profile_cache = ProfileCache()
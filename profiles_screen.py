@@ -1,9 +1,10 @@
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QScrollArea,
-                             QLabel, QPushButton, QFrame, QSizePolicy, QLineEdit)
+                             QLabel, QPushButton, QFrame, QSizePolicy, QLineEdit, QMessageBox)
 from PyQt6.QtCore import Qt
 import pandas as pd
 
 from ml_models import MLModels
+from run_store import StaleRunError
 
 class ProfilesScreen(QFrame):
     def __init__(self):
@@ -69,8 +70,13 @@ class ProfilesScreen(QFrame):
         """Добавляет информацию о профилях"""
         self.clear_all()
         a = MLModels()
-        cluster_summary, variables, clusters_info = a.load_profiles(['age', 'experience',
-                                'income', 'family', 'mortgage', 'personal_loan', 'creditcard'])
+        try:
+            cluster_summary, variables, clusters_info = a.load_profiles(['age', 'experience',
+                                    'income', 'family', 'mortgage', 'personal_loan', 'creditcard'])
+        except StaleRunError as e:
+            # исключение в слоте Qt завершило бы приложение
+            QMessageBox.warning(self, 'Профили устарели', str(e))
+            return
         self.add_variables(variables)
         self.add_summary(cluster_summary)
         self.add_clusters_info(clusters_info)
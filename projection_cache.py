@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+
+import numpy as np
+
+from cache_manager import cache_manager
+from instrumentation import tracer
+
+PROJECTION_CACHE_DIR = 'data/projection_cache'
+# Начиная с этого числа строк PCA обучается порциями (IncrementalPCA)
+INCREMENTAL_THRESHOLD = 200_000
+PCA_BATCH_SIZE = 50_000
+
+
+def make_key(fingerprint, features, n_components=2) -> str:
+    """Ключ проекции: от k она не зависит, только от данных и признаков"""
+    payload = json.dumps([fingerprint, list(features), int(n_components)])
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def fit_projection(scaled, n_components=2, random_state=42):
+    """Обучает PCA и возвращает (pca, координаты в float32).
+
+    На больших данных используется IncrementalPCA порциями по
+    PCA_BATCH_SIZE строк, чтобы не держать в памяти копии всей матрицы
+    для SVD.
+    """
+    from sklearn.decomposition import PCA, IncrementalPCA
+    from sklearn.utils import gen_batches
+
+    fitted = min(n_components, scaled.shape[1])
+    # при одном признаке недостающие оси графика остаются нулевыми
+    coords = np.zeros((len(scaled), n_components), dtype=np.float32)
+    if len(scaled) >= INCREMENTAL_THRESHOLD:
+        pca = IncrementalPCA(n_components=fitted, batch_size=PCA_BATCH_SIZE)
+        # partial_fit по срезам: IncrementalPCA.fit сделал бы записываемую копию
+        # всей матрицы (общая матрица признаков только для чтения)
+        for batch in gen_batches(len(scaled), PCA_BATCH_SIZE, min_batch_size=fitted):
+            pca.partial_fit(scaled[batch])
+        for start in range(0, len(scaled), PCA_BATCH_SIZE):
+            coords[start:start + PCA_BATCH_SIZE, :fitted] = pca.transform(scaled[start:start + PCA_BATCH_SIZE])
+    else:
+        pca = PCA(n_components=fitted, random_state=random_state)
+        coords[:, :fitted] = pca.fit_transform(scaled)
+    return pca, coords
+
+
+class ProjectionCache:
+    """Кэш 2D-проекции PCA по паре (данные, набор признаков).
+
+    Повторная сегментация с другим k берет готовые координаты и только
+    перекрашивает точки. Проекции хранятся в общем кэше в памяти и на
+    диске (см. cache_manager): координаты (.npy) и обученный PCA (.pkl).
+    """
+
+    region = 'projections'
+
+    def __init__(self, cache_dir=PROJECTION_CACHE_DIR):
+        self.cache_dir = cache_dir
+        cache_manager.disk.register(self.region, cache_dir, ('*.npy', '*.pkl'))
+
+    def _path(self, key, ext):
+        return os.path.join(self.cache_dir, f'{key}{ext}')
+
+    def get_or_fit(self, fingerprint, features, scaled, random_state=42):
+        """Возвращает (pca, coords), обучая PCA только при промахе кэша"""
+        key = make_key(fingerprint, features)
+        value = cache_manager.memory.get(self.region, key, None)
+        if value is not None:
+            return value
+
+        value = self._load(key)
+        if value is None:
+            with tracer.span('pca', rows=len(scaled)):
+                value = fit_projection(scaled, random_state=random_state)
+            self._save(key, value)
+        # координаты общие для всех вызывающих — только для чтения
+        value[1].setflags(write=False)
+        return cache_manager.memory.put(self.region, key, value)
+
+    def _load(self, key):
+        try:
+            with open(self._path(key, '.pkl'), 'rb') as f:
+                pca = pickle.load(f)
+            coords = np.load(self._path(key, '.npy'))
+        except (OSError, ValueError, pickle.UnpicklingError, EOFError):
+            return None
+        for ext in ('.pkl', '.npy'):
+            os.utime(self._path(key, ext))  # время доступа для LRU на диске
+        return pca, coords
+
+    def _save(self, key, value):
+        pca, coords = value
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            suffix = f'{os.getpid()}.{threading.get_ident()}.tmp'
+            # Координаты пишутся первыми: .pkl служит признаком готовой записи
+            path = self._path(key, '.npy')
+            with open(f'{path}.{suffix}', 'wb') as f:
+                np.save(f, coords)
+            os.replace(f'{path}.{suffix}', path)
+            path = self._path(key, '.pkl')
+            with open(f'{path}.{suffix}', 'wb') as f:
+                pickle.dump(pca, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(f'{path}.{suffix}', path)
+        except OSError:
+            return
+        cache_manager.disk.evict()
+
+    def clear(self):
+        """Очищает оба уровня кэша"""
+        cache_manager.clear(memory=True, disk=True, regions=[self.region])
+
+
+# Создаем глобальный экземпляр для использования в приложении
+projection_cache = ProjectionCache()
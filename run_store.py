@@ -0,0 +1,213 @@
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from datetime import datetime
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from data_store import data_store, CLIENT_DATA_PATH, CLUSTERS_PATH
+
+RUNS_DIR = 'data/runs'
+
+
+class StaleRunError(ValueError):
+    """Номера кластеров запуска посчитаны для другого файла или другого числа строк"""
+
+
+def labels_dtype(k):
+    """Самый компактный тип для номеров кластеров"""
+    return np.uint8 if k <= np.iinfo(np.uint8).max + 1 else np.uint16
+
+
+class RunWriter:
+    """Запись одного запуска сегментации.
+
+    Файлы пишутся во временный каталог, который при commit атомарно
+    переименовывается; другие сессии не видят недописанный запуск.
+    """
+
+    def __init__(self, store, features, k, n_rows, fingerprint=None, data_path=None):
+        self.store = store
+        created = datetime.now()
+        self.run_id = f'{created:%Y%m%d-%H%M%S-%f}-{uuid.uuid4().hex[:4]}'
+        self.meta = {'run_id': self.run_id, 'features': list(features), 'k': int(k),
+                     'n_rows': int(n_rows), 'created_at': created.isoformat(timespec='seconds'),
+                     'data_fingerprint': fingerprint,
+                     'data_path': None if data_path is None else os.path.abspath(data_path)}
+        os.makedirs(store.root, exist_ok=True)
+        self.tmp_dir = os.path.join(store.root, f'.{self.run_id}.tmp')
+        os.makedirs(self.tmp_dir)
+        self.labels = open_memmap(os.path.join(self.tmp_dir, 'labels.npy'), mode='w+',
+                                  dtype=labels_dtype(k), shape=(int(n_rows),))
+
+    def path(self, name):
+        """Путь для дополнительного файла запуска (до commit)"""
+        return os.path.join(self.tmp_dir, name)
+
+    def commit(self) -> str:
+        self.labels.flush()
+        del self.labels
+        with open(self.path('meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        os.replace(self.tmp_dir, os.path.join(self.store.root, self.run_id))
+        self.store._set_latest(self.run_id, self.meta['data_path'])
+        self.store.prune()
+        return self.run_id
+
+    def abort(self):
+        self.labels = None
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+
+class RunStore:
+    """Версионированное хранилище результатов сегментации.
+
+    Каждый запуск — каталог data/runs/<run_id> с номерами кластеров
+    (labels.npy, uint8/uint16) и meta.json (признаки, k, время, файл данных).
+    Файл LATEST указывает на последний запуск по любому файлу, а
+    LATEST.<хэш пути> — на последний запуск по конкретному файлу данных;
+    массивы читаются через memory-map.
+    """
+
+    def __init__(self, root=RUNS_DIR, max_runs=20):
+        self.root = root
+        self.max_runs = max_runs
+
+    def new_run(self, features, k, n_rows, fingerprint=None, data_path=None) -> RunWriter:
+        return RunWriter(self, features, k, n_rows, fingerprint, data_path)
+
+    def save(self, labels, features, k, fingerprint=None, data_path=None) -> str:
+        """Сохраняет номера кластеров как новый запуск"""
+        with self.new_run(features, k, len(labels), fingerprint, data_path) as run:
+            run.labels[:] = labels
+        return run.run_id
+
+    def _latest_path(self, data_path=None):
+        if data_path is None:
+            return os.path.join(self.root, 'LATEST')
+        digest = hashlib.blake2b(os.path.abspath(data_path).encode('utf-8'), digest_size=8).hexdigest()
+        return os.path.join(self.root, f'LATEST.{digest}')
+
+    def _write_pointer(self, path, run_id):
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(run_id)
+        os.replace(tmp_path, path)
+
+    def _read_pointer(self, path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def _set_latest(self, run_id, data_path=None):
+        self._write_pointer(self._latest_path(), run_id)
+        if data_path is not None:
+            self._write_pointer(self._latest_path(data_path), run_id)
+
+    def latest_id(self, data_path=None):
+        """Последний запуск по файлу data_path (без него — по любому файлу).
+
+        Запуски, сохраненные до появления пути в meta.json, ни к какому файлу
+        не привязаны: если по файлу запусков еще нет, берется такой последний
+        запуск (его номера потом проверяются по числу строк).
+        """
+        if data_path is None:
+            return self._read_pointer(self._latest_path())
+        run_id = self._read_pointer(self._latest_path(data_path))
+        if run_id is not None:
+            return run_id
+        run_id = self._read_pointer(self._latest_path())
+        if run_id is None:
+            return None
+        try:
+            legacy = self.load_meta(run_id).get('data_path') is None
+        except (OSError, ValueError):
+            return None
+        return run_id if legacy else None
+
+    def _latest_ids(self) -> set:
+        """Запуски, на которые указывает LATEST или LATEST.<хэш пути>"""
+        if not os.path.isdir(self.root):
+            return set()
+        return {self._read_pointer(os.path.join(self.root, name)) for name in os.listdir(self.root)
+                if name == 'LATEST' or (name.startswith('LATEST.') and not name.endswith('.tmp'))}
+
+    def list_runs(self) -> list:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if not name.startswith('.')
+                      and os.path.isfile(os.path.join(self.root, name, 'meta.json')))
+
+    def run_path(self, run_id, name):
+        return os.path.join(self.root, run_id, name)
+
+    def load_meta(self, run_id=None) -> dict:
+        run_id = run_id or self.latest_id()
+        with open(self.run_path(run_id, 'meta.json'), encoding='utf-8') as f:
+            return json.load(f)
+
+    def load_labels(self, run_id=None) -> np.ndarray:
+        """Номера кластеров запуска через memory-map (только для чтения)"""
+        run_id = run_id or self.latest_id()
+        return np.load(self.run_path(run_id, 'labels.npy'), mmap_mode='r')
+
+    def prune(self):
+        """Удаляет самые старые запуски сверх max_runs (последние по каждому файлу остаются)"""
+        latest = self._latest_ids()
+        runs = self.list_runs()
+        for run_id in runs[:max(0, len(runs) - self.max_runs)]:
+            if run_id not in latest:
+                shutil.rmtree(os.path.join(self.root, run_id), ignore_errors=True)
+
+
+def load_cluster_labels(run_id=None, n_rows=None, fingerprint=None, data_path=None) -> np.ndarray:
+    """Номера кластеров последнего по файлу data_path (или указанного) запуска.
+
+    Если запусков еще нет, читается файл data/client_data_clusters.csv
+    из старого формата (он относится только к основному файлу клиентов).
+    Запуск по другому файлу данных отклоняется (StaleRunError). Если
+    передано число строк текущего файла данных (n_rows) и его отпечаток не
+    совпадает с отпечатком запуска, номера проверяются на соответствие
+    строкам: после дописывания строк (до дообучения) выбрасывается
+    StaleRunError.
+    """
+    run_id = run_id or run_store.latest_id(data_path)
+    if run_id is None:
+        if data_path is not None and os.path.abspath(data_path) != os.path.abspath(CLIENT_DATA_PATH):
+            raise FileNotFoundError(f'Нет сохраненных запусков сегментации для файла {data_path}')
+        labels = data_store.get(CLUSTERS_PATH)['cluster_KMeans'].to_numpy()
+        meta = {'n_rows': len(labels), 'data_fingerprint': None}
+    else:
+        meta = run_store.load_meta(run_id)
+        labels = run_store.load_labels(run_id)
+        run_data = meta.get('data_path')
+        if data_path is not None and run_data is not None and run_data != os.path.abspath(data_path):
+            raise StaleRunError(f'Запуск {run_id} построен по файлу {run_data}, а не {data_path}: '
+                                'выполните сегментацию для этого файла')
+    if n_rows is None or (fingerprint is not None and fingerprint == meta.get('data_fingerprint')):
+        return labels
+    if n_rows != meta['n_rows'] or n_rows != len(labels):
+        source = f'запуска {run_id}' if run_id is not None else f'файла {CLUSTERS_PATH}'
+        raise StaleRunError(f'Номера кластеров {source} посчитаны для {meta["n_rows"]} строк, '
+                            f'а в файле данных {n_rows}: дообучите модель («Переобучить модель») '
+                            'или выполните сегментацию заново')
+    return labels
+
+
+# Создаем глобальный экземпляр для использования в приложении
+run_store = RunStore()
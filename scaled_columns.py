@@ -0,0 +1,74 @@
+import numpy as np
+
+from cache_manager import cache_manager
+from data_store import data_store
+from instrumentation import tracer
+from schema import FEATURE_DTYPE, feature_matrix
+from shared_matrix import SharedMatrix
+
+
+def scale_column(values):
+    """Среднее, дисперсия, масштаб и стандартизованный столбец (как в StandardScaler)"""
+    mean = float(values.mean(dtype=np.float64))
+    var = float(values.var(dtype=np.float64))
+    # постоянный столбец не делится на ноль: масштаб 1, как в sklearn
+    scale = float(np.sqrt(var)) if var > np.finfo(np.float64).eps else 1.0
+    scaled = ((values - mean) / scale).astype(FEATURE_DTYPE, copy=False)
+    scaled.setflags(write=False)
+    return {'mean': mean, 'var': var, 'scale': scale, 'n': len(values)}, scaled
+
+
+def make_scaler(features, stats):
+    """StandardScaler, обученный по готовым статистикам столбцов (для конвейера)"""
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler()
+    scaler.mean_ = np.array([s['mean'] for s in stats])
+    scaler.var_ = np.array([s['var'] for s in stats])
+    scaler.scale_ = np.array([s['scale'] for s in stats])
+    scaler.n_samples_seen_ = stats[0]['n'] if stats else 0
+    scaler.n_features_in_ = len(features)
+    scaler.feature_names_in_ = np.array(features, dtype=object)
+    return scaler
+
+
+class ScaledColumnCache:
+    """Стандартизованные столбцы по отдельности, ключ — (отпечаток данных, столбец).
+
+    Стандартизация каждого столбца не зависит от остальных, поэтому при
+    смене набора признаков считаются только столбцы, которых еще нет в
+    кэше; матрица собирается из готовых столбцов. Записи лежат в общем
+    кэше в памяти (см. cache_manager).
+    """
+
+    region = 'scaled'
+
+    def columns(self, path, features) -> list:
+        """[(статистики, столбец)] в порядке features"""
+        fingerprint = data_store.fingerprint(path)
+        found = {name: cache_manager.memory.get(self.region, ('column', fingerprint, name), None)
+                 for name in features}
+        missing = [name for name, value in found.items() if value is None]
+        tracer.count('scaled_columns.hits', len(features) - len(missing))
+        if missing:
+            tracer.count('scaled_columns.misses', len(missing))
+            # загружаются только недостающие столбцы
+            data = feature_matrix(data_store.get(path, columns=missing), missing)
+            with tracer.span('scaling', features=len(missing)):
+                for name in missing:
+                    found[name] = cache_manager.memory.put(self.region, ('column', fingerprint, name),
+                                                           scale_column(data[name].to_numpy()))
+        return [found[name] for name in features]
+
+    def matrix(self, path, features):
+        """(StandardScaler, SharedMatrix) для набора признаков из закэшированных столбцов"""
+        columns = self.columns(path, features)
+        scaler = make_scaler(features, [stats for stats, _ in columns])
+        return scaler, SharedMatrix.from_columns(column for _, column in columns)
+
+    def clear(self):
+        cache_manager.memory.clear([self.region])
+
+
+# Создаем глобальный экземпляр для использования в приложении
+scaled_columns = ScaledColumnCache()
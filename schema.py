@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+# Версия схемы хранится в манифесте поколоночного кэша: при ее изменении
+# кэш пересобирается
+SCHEMA_VERSION = 1
+
+# Компактные типы столбцов данных о клиентах. Флаги 0/1 хранятся как uint8,
+# а не bool: так сохраняются арифметика и вид 0/1 при экспорте в CSV
+CLIENT_SCHEMA = {
+    'age': np.uint8,
+    'experience': np.int8,
+    'income': np.int16,
+    'family': np.uint8,
+    'mortgage': np.int16,
+    'personal_loan': np.uint8,
+    'creditcard': np.uint8,
+    'loan_delinquency': np.uint8,
+    'non_valid_passport': np.uint8,
+    'undergraduate_edu': np.uint8,
+    'graduate_edu': np.uint8,
+    'advance_edu': np.uint8,
+    'cluster_KMeans': np.uint8,
+}
+
+# Тип матриц признаков для масштабирования, KMeans и PCA
+FEATURE_DTYPE = np.float32
+
+
+def fits(values, dtype) -> bool:
+    """Помещаются ли значения в целочисленный тип без потерь"""
+    if not np.issubdtype(values.dtype, np.integer):
+        return False
+    if len(values) == 0:
+        return True
+    info = np.iinfo(dtype)
+    return info.min <= values.min() and values.max() <= info.max
+
+
+def apply_schema(frame, schema=CLIENT_SCHEMA) -> pd.DataFrame:
+    """Приводит столбцы к компактным типам.
+
+    Столбец остается как есть, если он не целочисленный (например, есть
+    пропуски) или его значения не помещаются в объявленный тип.
+    """
+    dtypes = {name: dtype for name, dtype in schema.items()
+              if name in frame.columns and fits(frame[name].to_numpy(), dtype)}
+    return frame.astype(dtypes, copy=False) if dtypes else frame
+
+
+def feature_matrix(data, features) -> pd.DataFrame:
+    """Признаки для обучения в float32 (с именами столбцов для sklearn)"""
+    return data[list(features)].astype(FEATURE_DTYPE)
+
+
+def baseline_nbytes(data) -> int:
+    """Сколько заняли бы числовые столбцы при загрузке по умолчанию (64 бита)"""
+    numeric = sum(np.issubdtype(dtype, np.number) for dtype in data.dtypes)
+    return len(data) * 8 * numeric + data.index.memory_usage()
@@ -0,0 +1,284 @@
+"""Локальный HTTP-сервис сегментации (обучение, отнесение клиентов к кластерам, профили).
+
+Запуск:
+    python service.py --port 8765
+
+Эндпоинты (JSON):
+    GET  /health                    — состояние и последний запуск
+    GET  /runs                      — список сохраненных запусков
+    GET  /profiles?features=age,... — профили кластеров последнего запуска
+    POST /fit      {"features": [...], "k": 5}, необязательно "engine" (см. clustering_engines)
+    POST /retrain  {}
+    POST /score    {"rows": [{...}, ...]} или {"columns": {"age": [...], ...}},
+                   необязательно "run_id" и "distances": true
+
+Одновременные запросы /score собираются в пачки и считаются одним
+векторизованным расчетом расстояний до центроидов; обученные конвейеры
+остаются в памяти (см. cache_manager). Клиент — service_client.py.
+"""
+import argparse
+import json
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import tracer
+from clustering_engines import AUTO
+from data_store import CLIENT_DATA_PATH
+from ml_models import MLModels
+from pipeline import load_pipeline
+from run_store import run_store
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+
+class ScoringBatcher:
+    """Собирает запросы на отнесение к кластерам в пачки.
+
+    Фоновый поток ждет первый запрос, затем до max_delay секунд добирает
+    следующие (но не больше max_batch_rows строк) и считает каждую группу
+    с одним run_id одним вызовом SegmentationPipeline.distances.
+    """
+
+    def __init__(self, max_batch_rows=10_000, max_delay=0.005):
+        self.max_batch_rows = max_batch_rows
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name='scoring-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, frame, run_id=None, with_distances=False) -> Future:
+        future = Future()
+        self._queue.put((frame, run_id or run_store.latest_id(), with_distances, future))
+        return future
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            rows = len(item[0])
+            deadline = time.monotonic() + self.max_delay
+            while rows < self.max_batch_rows:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+                rows += len(item[0])
+
+            groups = {}
+            for item in batch:
+                groups.setdefault(item[1], []).append(item)
+            for run_id, items in groups.items():
+                self._score(run_id, items)
+
+    def _score(self, run_id, items):
+        try:
+            if run_id is None:
+                raise FileNotFoundError('Нет сохраненных запусков сегментации')
+            pipeline = load_pipeline(run_id)
+        except Exception as e:
+            for item in items:
+                item[3].set_exception(e)
+            return
+
+        # каждый запрос проверяется и масштабируется отдельно: ошибка в одном
+        # (нет признака, нечисловые значения) не влияет на остальные в пачке
+        valid = []
+        for frame, _, with_distances, future in items:
+            try:
+                valid.append((pipeline.transform(frame), with_distances, future))
+            except Exception as e:
+                future.set_exception(e)
+        if not valid:
+            return
+
+        try:
+            with tracer.span('service.score', requests=len(valid)):
+                distances = pipeline.distances(np.vstack([scaled for scaled, _, _ in valid]))
+                labels = distances.argmin(axis=1)
+            tracer.count('service.batches')
+        except Exception as e:
+            for _, _, future in valid:
+                future.set_exception(e)
+            return
+
+        start = 0
+        for scaled, with_distances, future in valid:
+            end = start + len(scaled)
+            result = {'run_id': run_id, 'labels': labels[start:end].tolist()}
+            if with_distances:
+                result['distances'] = np.sqrt(distances[start:end]).tolist()
+            future.set_result(result)
+            start = end
+
+
+def _frame(payload) -> pd.DataFrame:
+    """Клиенты из тела запроса: список строк или словарь столбцов"""
+    if 'columns' in payload:
+        return pd.DataFrame(payload['columns'])
+    if 'rows' in payload:
+        return pd.DataFrame.from_records(payload['rows'])
+    raise ValueError('Ожидается поле "rows" или "columns"')
+
+
+class SegmentationService:
+    """Обработчики эндпоинтов поверх MLModels"""
+
+    def __init__(self, data_path=None, batcher=None):
+        self.data_path = data_path or CLIENT_DATA_PATH
+        self.batcher = batcher or ScoringBatcher()
+        # обучение меняет последний запуск, поэтому выполняется по одному
+        self._fit_lock = threading.Lock()
+
+    def _models(self, engine=AUTO) -> MLModels:
+        return MLModels(self.data_path, engine=engine)
+
+    def health(self, query, payload):
+        return {'status': 'ok', 'run_id': run_store.latest_id(self.data_path)}
+
+    def runs(self, query, payload):
+        return {'runs': run_store.list_runs(), 'latest': run_store.latest_id(self.data_path)}
+
+    def profiles(self, query, payload):
+        features = query.get('features', [''])[0]
+        if features:
+            features = features.split(',')
+        elif run_store.latest_id(self.data_path) is not None:
+            features = run_store.load_meta(run_store.latest_id(self.data_path))['features']
+        else:
+            raise FileNotFoundError('Нет сохраненных запусков сегментации')
+        summary, features, descriptions = self._models().load_profiles(features)
+        return {'features': features,
+                'clusters': json.loads(summary.reset_index().to_json(orient='records')),
+                'descriptions': {str(k): v for k, v in descriptions.items()}}
+
+    def fit(self, query, payload):
+        features = list(payload['features'])
+        k = int(payload['k'])
+        with self._fit_lock:
+            models = self._models(payload.get('engine', AUTO))
+            if not models.scaler_data({name: 1 for name in features}, {}):
+                raise ValueError('Не выбраны признаки для кластеризации')
+            _, data = models.for_plot_cluster_graph(k)
+        sizes = np.bincount(data['cluster_KMeans'].to_numpy(), minlength=k)
+        return {'run_id': models.run_id, 'engine': models.resolve_engine(k), 'inertia': models.inertia,
+                'sizes': sizes.tolist()}
+
+    def retrain(self, query, payload):
+        with self._fit_lock:
+            return self._models().retrain()
+
+    def score(self, query, payload):
+        # по умолчанию — последний запуск по файлу сервиса, а не по любому файлу
+        run_id = payload.get('run_id') or run_store.latest_id(self.data_path)
+        future = self.batcher.submit(_frame(payload), run_id,
+                                     bool(payload.get('distances', False)))
+        return future.result()
+
+    def routes(self) -> dict:
+        return {
+            ('GET', '/health'): self.health,
+            ('GET', '/runs'): self.runs,
+            ('GET', '/profiles'): self.profiles,
+            ('POST', '/fit'): self.fit,
+            ('POST', '/retrain'): self.retrain,
+            ('POST', '/score'): self.score,
+        }
+
+
+def make_handler(service):
+    routes = service.routes()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _send(self, status, body):
+            data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _handle(self, method):
+            url = urlparse(self.path)
+            handler = routes.get((method, url.path))
+            length = int(self.headers.get('Content-Length') or 0)
+            raw = self.rfile.read(length) if length else b''
+            if handler is None:
+                self._send(404, {'error': f'Неизвестный адрес: {method} {url.path}'})
+                return
+            try:
+                payload = json.loads(raw) if raw else {}
+                self._send(200, handler(parse_qs(url.query), payload))
+            except FileNotFoundError as e:
+                self._send(404, {'error': str(e)})
+            except (ValueError, KeyError, TypeError) as e:
+                self._send(400, {'error': str(e)})
+            except Exception as e:
+                self._send(500, {'error': f'{type(e).__name__}: {e}'})
+
+        def do_GET(self):
+            self._handle('GET')
+
+        def do_POST(self):
+            self._handle('POST')
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class SegmentationServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # длинная очередь соединений: одновременные запросы /score и собираются в пачки
+    request_queue_size = 128
+
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT, service=None) -> SegmentationServer:
+    """Сервер без запуска (port=0 — свободный порт, см. server.server_address)"""
+    return SegmentationServer((host, port), make_handler(service or SegmentationService()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Smart Segmenter: локальный сервис сегментации')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--input', default=None, help='CSV с данными клиентов')
+    args = parser.parse_args(argv)
+
+    server = make_server(args.host, args.port, SegmentationService(args.input))
+    print(f'Сервис сегментации: http://{args.host}:{server.server_address[1]}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""Клиент локального сервиса сегментации (см. service.py), только стандартная библиотека"""
+import json
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+# Совпадают с service.py (клиент не импортирует сервис и его зависимости)
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+
+class ServiceError(Exception):
+    """Ошибка, которую вернул сервис (HTTP-статус и текст)"""
+
+    def __init__(self, status, message):
+        super().__init__(f'{status}: {message}')
+        self.status = status
+        self.message = message
+
+
+class SegmentationClient:
+    def __init__(self, base_url=f'http://{DEFAULT_HOST}:{DEFAULT_PORT}', timeout=600):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def _request(self, method, path, payload=None):
+        data = None if payload is None else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        request = Request(self.base_url + path, data=data, method=method,
+                          headers={'Content-Type': 'application/json'})
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except HTTPError as e:
+            try:
+                message = json.loads(e.read())['error']
+            except (ValueError, KeyError):
+                message = e.reason
+            raise ServiceError(e.code, message) from None
+
+    def health(self) -> dict:
+        return self._request('GET', '/health')
+
+    def runs(self) -> dict:
+        return self._request('GET', '/runs')
+
+    def profiles(self, features=None) -> dict:
+        query = f"?{urlencode({'features': ','.join(features)})}" if features else ''
+        return self._request('GET', '/profiles' + query)
+
+    def fit(self, features, k, engine='auto') -> dict:
+        return self._request('POST', '/fit', {'features': list(features), 'k': int(k), 'engine': engine})
+
+    def retrain(self) -> dict:
+        return self._request('POST', '/retrain', {})
+
+    def score(self, rows, run_id=None, distances=False) -> dict:
+        """Номера кластеров для клиентов.
+
+        rows — список словарей {признак: значение} или DataFrame.
+        """
+        if hasattr(rows, 'to_dict'):
+            payload = {'columns': rows.to_dict(orient='list')}
+        else:
+            payload = {'rows': list(rows)}
+        if run_id is not None:
+            payload['run_id'] = run_id
+        payload['distances'] = distances
+        return self._request('POST', '/score', payload)
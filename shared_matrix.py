@@ -0,0 +1,166 @@
+"""Матрица признаков float32, общая для процессов: разделяемая память или файл в памяти.
+
+Владелец (SharedMatrix) записывает матрицу один раз; процессы-воркеры
+получают только ее описание (MatrixHandle — имя, форма, тип) и
+подключаются к тем же страницам памяти без копирования и сериализации.
+"""
+import os
+import tempfile
+import uuid
+import weakref
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from schema import FEATURE_DTYPE
+
+SHM = 'shm'
+MEMMAP = 'memmap'
+# Каталог для матриц в файлах, если разделяемой памяти не хватает
+MEMMAP_DIR = os.path.join(tempfile.gettempdir(), 'smart_segmenter')
+# Разделяемая память в Linux — файлы в tmpfs
+SHM_DIR = '/dev/shm'
+
+
+def _shm_fits(nbytes) -> bool:
+    """Хватит ли места в разделяемой памяти.
+
+    Сегмент создается без выделения страниц, поэтому переполнение tmpfs
+    обнаружилось бы только при записи (SIGBUS), а не при создании.
+    """
+    if not os.path.isdir(SHM_DIR):
+        return True
+    stat = os.statvfs(SHM_DIR)
+    return nbytes <= stat.f_bavail * stat.f_frsize
+
+
+class MatrixHandle:
+    """Описание общей матрицы для передачи в другой процесс (сериализуется мгновенно)"""
+
+    def __init__(self, kind, name, shape, dtype):
+        self.kind = kind
+        self.name = name
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype).str
+
+    def attach(self) -> 'AttachedMatrix':
+        """Подключается к матрице (только для чтения)"""
+        return AttachedMatrix(self)
+
+
+class AttachedMatrix:
+    """Матрица, подключенная по описанию в процессе-воркере"""
+
+    def __init__(self, handle):
+        self.handle = handle
+        self._shm = None
+        if handle.kind == SHM:
+            # Воркеры spawn используют resource_tracker родителя, поэтому
+            # сегмент удаляется один раз — владельцем (SharedMatrix)
+            self._shm = shared_memory.SharedMemory(name=handle.name)
+            self.array = np.ndarray(handle.shape, dtype=handle.dtype, buffer=self._shm.buf)
+            self.array.setflags(write=False)
+        else:
+            self.array = np.load(handle.name, mmap_mode='r')
+
+    def close(self):
+        self.array = None
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _release(kind, resource):
+    """Удаляет сегмент или файл; уже открытые отображения остаются действительными"""
+    if kind == SHM:
+        try:
+            resource.unlink()
+        except FileNotFoundError:
+            pass
+        try:
+            resource.close()
+        except BufferError:
+            # на память еще ссылаются массивы: она освободится вместе с ними
+            pass
+    else:
+        try:
+            os.remove(resource)
+        except OSError:
+            pass
+
+
+class SharedMatrix:
+    """Владелец общей матрицы float32.
+
+    Матрица копируется в разделяемую память (или, если ее не хватает, в
+    файл во временном каталоге) один раз. array — представление только
+    для чтения, handle — описание для воркеров (MatrixHandle.attach).
+    Сегмент удаляется при release() или когда владелец больше не нужен.
+    """
+
+    def __init__(self, array, kind=SHM):
+        array = np.asarray(array, dtype=FEATURE_DTYPE)
+        self._allocate(array.shape, kind)
+        self.array[:] = array
+        self._seal()
+
+    @classmethod
+    def from_columns(cls, columns, kind=SHM) -> 'SharedMatrix':
+        """Матрица из столбцов, записанных сразу в общую память (без промежуточной копии)"""
+        columns = list(columns)
+        matrix = cls.__new__(cls)
+        matrix._allocate((len(columns[0]) if columns else 0, len(columns)), kind)
+        for i, column in enumerate(columns):
+            matrix.array[:, i] = column
+        matrix._seal()
+        return matrix
+
+    def _allocate(self, shape, kind):
+        dtype = np.dtype(FEATURE_DTYPE)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        if kind == SHM and not _shm_fits(nbytes):
+            kind = MEMMAP
+        if kind == SHM:
+            try:
+                resource = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+            except OSError:
+                # например, маленький /dev/shm в контейнере
+                kind = MEMMAP
+        if kind == SHM:
+            name = resource.name
+            self.array = np.ndarray(shape, dtype=dtype, buffer=resource.buf)
+        else:
+            os.makedirs(MEMMAP_DIR, exist_ok=True)
+            name = resource = os.path.join(MEMMAP_DIR, f'{os.getpid()}-{uuid.uuid4().hex}.npy')
+            self.array = np.lib.format.open_memmap(name, mode='w+', dtype=dtype, shape=shape)
+        self.kind = kind
+        self.handle = MatrixHandle(kind, name, shape, dtype)
+        self._finalizer = weakref.finalize(self, _release, kind, resource)
+
+    def _seal(self):
+        if self.kind == MEMMAP:
+            self.array.flush()
+        self.array.setflags(write=False)
+
+    @property
+    def shape(self):
+        return self.array.shape
+
+    @property
+    def nbytes(self) -> int:
+        return self.array.nbytes
+
+    def release(self):
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from profile_stats import aggregates_from_sums
+from schema import feature_matrix
+
+DEFAULT_CHUNKSIZE = 100_000
+
+
+def iter_chunks(path, features, chunksize=DEFAULT_CHUNKSIZE):
+    """Читает из CSV только нужные столбцы, порциями по chunksize строк (float32)"""
+    for chunk in pd.read_csv(path, usecols=features, chunksize=chunksize):
+        yield feature_matrix(chunk, features)
+
+
+def fit_scaler_streaming(path, features, chunksize=DEFAULT_CHUNKSIZE):
+    """Первый проход: среднее и дисперсия признаков через partial_fit"""
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler()
+    for chunk in iter_chunks(path, features, chunksize):
+        scaler.partial_fit(chunk)
+    return scaler
+
+
+def fit_kmeans_streaming(path, features, scaler, n_clusters, chunksize=DEFAULT_CHUNKSIZE,
+                         n_epochs=1, random_state=42):
+    """Второй проход (или несколько эпох): обучение MiniBatchKMeans по порциям"""
+    from sklearn.cluster import MiniBatchKMeans
+
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=random_state,
+                             batch_size=min(chunksize, 4096), n_init=3)
+    for _ in range(n_epochs):
+        for chunk in iter_chunks(path, features, chunksize):
+            kmeans.partial_fit(scaler.transform(chunk))
+    return kmeans
+
+
+def assign_streaming(path, features, scaler, kmeans, labels_out, chunksize=DEFAULT_CHUNKSIZE):
+    """Последний проход: запись номеров кластеров порциями в labels_out.
+
+    labels_out — массив длиной в число строк (например, memory-map запуска
+    из run_store). Возвращает размеры кластеров, инерцию по всем данным и
+    агрегаты профилей по признакам features (см. profile_stats) — они
+    накапливаются тут же, без повторного чтения файла целиком.
+    """
+    k = kmeans.n_clusters
+    sizes = np.zeros(k, dtype=np.int64)
+    sums = np.zeros((k, len(features)))
+    sumsq = np.zeros((k, len(features)))
+    inertia = 0.0
+    start = 0
+    for chunk in iter_chunks(path, features, chunksize):
+        distances = kmeans.transform(scaler.transform(chunk))
+        labels = distances.argmin(axis=1)
+        inertia += float((distances[np.arange(len(labels)), labels] ** 2).sum())
+        sizes += np.bincount(labels, minlength=k)
+        for j, name in enumerate(features):
+            values = chunk[name].to_numpy(dtype=np.float64)
+            sums[:, j] += np.bincount(labels, weights=values, minlength=k)
+            sumsq[:, j] += np.bincount(labels, weights=values * values, minlength=k)
+        labels_out[start:start + len(labels)] = labels
+        start += len(labels)
+    return sizes, inertia, aggregates_from_sums(list(features), sizes, sums, sumsq)